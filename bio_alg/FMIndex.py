@@ -1,16 +1,141 @@
 # This script was written mostly for my understanding of text indices
+import collections
+import io
+import itertools
+import json
+import multiprocessing
+import struct
+
+import numpy as np
+
+from bio_alg.fasta import open_sequences, read_records
+from bio_alg.occ import BACKENDS, choose_backend
+from bio_alg.suffix_array import encode, decode, suffix_array
+
 EOS = "\0"
+# placed between the records of a generalized index
+SEP = "\1"
+
+# on-disk layout: magic, format version (uint32), header size (uint64),
+# json header, then every array aligned to ALIGN bytes
+MAGIC = b"FMINDEX\0"
+FORMAT_VERSION = 1
+ALIGN = 64
 
 
 class FMIndex(object):
-    def __init__(self, data):
-        self.data = bwt(data)
-        self.offset = {}
-        self._build(data)
+    # structures used to locate hits, written out by save
+    _locate_arrays = ('sa_rows', 'sa_samples')
+    _locate_scalars = ('sa_sample_rate',)
+
+    def __init__(self, data, occ_sample_rate=64, sa_sample_rate=32,
+                 backend='auto'):
+        """
+        Args:
+            data: text to index
+            occ_sample_rate: distance between rank checkpoints, trades
+                memory of the occurrence table for rank speed
+            sa_sample_rate: every sa_sample_rate-th text position keeps its
+                suffix array entry, so a hit is located in at most that
+                many lf steps
+            backend: storage of the BWT and its occurrence table, one of
+                'plain' (a byte per symbol), 'dna' (2 bit packed ACGT),
+                'wavelet' (wavelet matrix for large alphabets), 'rle'
+                (BWT runs, see RLFMIndex) or 'auto'
+        """
+        text, sa = _suffix_array(data)
+        self._build(text[sa - 1], occ_sample_rate, backend)
+        self._sample_sa(sa, sa_sample_rate)
+        self._path = None
+        self.record_ids = None
+        self.record_starts = None
+
+    @classmethod
+    def from_records(cls, records, **kwargs):
+        """ build one generalized index over many (record_id, sequence)
+            pairs.
+
+            The sequences are concatenated with SEP between them and the
+            start of every record is kept in a sorted array, so search
+            reports (record_id, offset) pairs. Keyword arguments are passed
+            on to FMIndex.
+        """
+        text = io.StringIO()
+        record_ids, starts, start = [], [], 0
+        for record_id, seq in records:
+            assert SEP not in seq, "Records cannot contain the separator"
+            if record_ids:
+                text.write(SEP)
+                start += 1
+            record_ids.append(record_id)
+            starts.append(start)
+            text.write(seq)
+            start += len(seq)
+        index = cls(text.getvalue(), **kwargs)
+        index.record_ids = record_ids
+        index.record_starts = np.array(starts, dtype=np.int64)
+        return index
+
+    @classmethod
+    def from_fasta(cls, path, **kwargs):
+        """ build a generalized index of every record of a (gzipped)
+            FASTA/FASTQ file """
+        with open_sequences(path) as handle:
+            return cls.from_records(read_records(handle), **kwargs)
+
+    def _resolve(self, offsets):
+        """ text offsets as (record_id, offset) pairs for a generalized
+            index, as they are otherwise """
+        offsets = np.sort(np.asarray(offsets, dtype=np.int64))
+        if self.record_ids is None:
+            return offsets.tolist()
+        doc = np.searchsorted(self.record_starts, offsets, side='right') - 1
+        local = offsets - self.record_starts[doc]
+        return [(self.record_ids[d], o)
+                for d, o in zip(doc.tolist(), local.tolist())]
 
-    def _build(self, data):
+    def _build(self, last, occ_sample_rate, backend):
         """ build the index """
-        self.occ = first_occ(self.data)
+        symbols, codes = np.unique(last, return_inverse=True)
+        counts = np.bincount(codes.reshape(-1), minlength=len(symbols))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        self._set_alphabet(list(decode(symbols)), starts)
+        if backend == 'auto':
+            backend = choose_backend(self.alphabet)
+        if backend not in BACKENDS:
+            raise ValueError('Unknown backend {}, expected one of {}'.format(
+                backend, sorted(BACKENDS)))
+        self.backend = backend
+        self.tally = BACKENDS[backend](
+            codes.reshape(-1), self.alphabet, occ_sample_rate)
+
+    def _set_alphabet(self, alphabet, starts):
+        """ symbol lookups: code of every letter and its first occurance
+            in the first column """
+        self.alphabet = alphabet
+        self._codes = dict((ch, i) for i, ch in enumerate(self.alphabet))
+        self._C = np.asarray(starts, dtype=np.int64)
+        self.occ = dict(zip(self.alphabet, self._C.tolist()))
+
+    def __len__(self):
+        return len(self.tally)
+
+    @property
+    def data(self):
+        """ the transformed string, decoded from the occurrence table """
+        symbols = encode(''.join(self.alphabet))
+        return decode(symbols[self.tally.access_many(np.arange(len(self)))])
+
+    def _sample_sa(self, sa, sa_sample_rate):
+        """ keep the suffix array entries of every sa_sample_rate-th text
+            position, keyed by their (sorted) row in the BWT """
+        if sa_sample_rate < 1:
+            raise ValueError('sa_sample_rate must be positive')
+        self.sa_sample_rate = sa_sample_rate
+        dtype = _index_dtype(len(sa))
+        rows = np.flatnonzero(sa % sa_sample_rate == 0)
+        self.sa_rows = rows.astype(dtype)
+        self.sa_samples = sa[rows].astype(dtype)
 
     def _occ(self, qc):
         c = self.occ.get(qc)
@@ -20,13 +145,10 @@ class FMIndex(object):
 
     def _count(self, idx, qc):
         """count the occurances of letter qc (rank of qc) upto position idx """
-        if qc not in self.occ.keys():
+        c = self._codes.get(qc)
+        if c is None:
             return 0
-        c = 0
-        for i in xrange(idx):
-            if self.data[i] == qc:
-                c += 1
-        return c
+        return self.tally.rank(c, idx)
 
     def _lf(self, idx, qc):
         """ get the nearset lf mapping for letter qc at position idx """
@@ -39,20 +161,63 @@ class FMIndex(object):
             from the beginning """
         r = 0
         i = idx
-        while self.data[i] != EOS:
-            if self.offset.get(i):
-                r += self.offset[i]
-                break
+        while True:
+            j = int(np.searchsorted(self.sa_rows, i))
+            if j < len(self.sa_rows) and self.sa_rows[j] == i:
+                return int(self.sa_samples[j]) + r
             r += 1
-            i = self._lf(i, self.data[i])
-        if not self.offset.get(idx):
-            self.offset[i] = r
-        return r
+            c = self.tally.access(i)
+            i = int(self._C[c]) + self.tally.rank(c, i)
+
+    def _locate(self, rows):
+        """ text offsets of the given BWT rows.
+
+            All rows are walked together with lf mapping until they land on
+            a sampled row; the offset is the sample plus the steps taken.
+            Text position 0 is always sampled, so no walk passes the end of
+            file marker and none takes more than sa_sample_rate steps.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) <= 4:
+            # a few rows walk faster one at a time on python ints
+            return np.array([self._walk(i) for i in rows.tolist()],
+                            dtype=np.int64)
+        offsets = np.empty(len(rows), dtype=np.int64)
+        pending = np.arange(len(rows))
+        steps = 0
+        last = len(self.sa_rows) - 1
+        while len(pending):
+            j = np.minimum(np.searchsorted(self.sa_rows, rows), last)
+            hit = self.sa_rows[j] == rows
+            offsets[pending[hit]] = self.sa_samples[j[hit]] + steps
+            pending, rows = pending[~hit], rows[~hit]
+            c = self.tally.access_many(rows).astype(np.int64)
+            rows = self._C[c] + self.tally.rank_many(c, rows)
+            steps += 1
+        return offsets
+
+    def _toehold_start(self):
+        """ suffix array entry of the last row of the whole BWT, for
+            indexes that locate from it (see RLFMIndex); None here """
+        return None
+
+    def _toehold(self, c, top, bot, toe):
+        """ suffix array entry of the last row of the range [top, bot)
+            extended by letter c, given toe of [top, bot); None here """
+        return None
+
+    def _locate_range(self, top, bot, toe, count=None):
+        """ text offsets of the last count rows of [top, bot), all of
+            them when count is None; the last row has the suffix array
+            entry toe when it is tracked """
+        if count is not None:
+            top = max(top, bot - count)
+        return self._locate(np.arange(top, bot))
 
     def bounds(self, q):
         """ find the first and last suffix positions for query q """
         top = 0
-        bot = len(self.data)
+        bot = len(self)
         for i, qc in enumerate(q[::-1]):
             top = self._lf(top, qc)
             bot = self._lf(bot, qc)
@@ -65,56 +230,452 @@ class FMIndex(object):
 
         # find the suffixes for the query
         top, bot = self.bounds(q)
-        matches = []
         # find the location of the suffixes
         # by walking the reverse text from that position
         # with lf mapping
-        for i in range(top, bot):
-            pos = self._walk(i)
-            matches.append(pos)
-        return sorted(matches)
+        matches = self._locate(np.arange(top, bot))
+        return self._resolve(matches)
 
     def count(self, q):
         """ count occurances of q in the index """
         top, bot = self.bounds(q)
         return bot - top
 
+    def _lower_bounds(self, codes):
+        """ BWA style D array: D[i] is a lower bound on the differences
+            needed to match codes[0..i].
+
+            Scanning leftwards from i, q[0..i] is cut greedily into pieces
+            that do not occur in the text; every such piece needs at least
+            one difference. All end points i are scanned together, one
+            vectorized backward search step per query letter.
+        """
+        m, n = len(codes), len(self)
+        pos = np.arange(m, dtype=np.int64)
+        top = np.zeros(m, dtype=np.int64)
+        bot = np.full(m, n, dtype=np.int64)
+        diffs = np.zeros(m, dtype=np.int64)
+        for _ in range(m):
+            live = np.flatnonzero(pos >= 0)
+            c = codes[pos[live]]
+            known = c >= 0
+            new_top, new_bot = top[live], bot[live]
+            ck = c[known]
+            new_top[known] = \
+                self._C[ck] + self.tally.rank_many(ck, new_top[known])
+            new_bot[known] = \
+                self._C[ck] + self.tally.rank_many(ck, new_bot[known])
+            miss = ~known | (new_top >= new_bot)
+            diffs[live[miss]] += 1
+            new_top[miss], new_bot[miss] = 0, n
+            top[live], bot[live] = new_top, new_bot
+            pos[live] -= 1
+        return diffs
+
+    def search_approx(self, q, k=1, mode='mismatch', max_hits=1000):
+        """ search the positions of query q with up to k differences.
+
+            Backtracking backward search in the style of BWA: a branch
+            that has z differences left at letter i is dropped as soon as
+            z < D[i] (see _lower_bounds), and the search stops once
+            max_hits occurances are found. Only max_hits rows are ever
+            located, so repeats cannot blow up the latency.
+
+        Args:
+            q: query
+            k: maximal number of differences
+            mode: 'mismatch' counts substitutions only, 'edit' also
+                insertions and deletions
+            max_hits: cap on the number of reported occurances
+        Returns:
+            sorted list of (position, differences) pairs, the position is
+            (record_id, offset) for a generalized index
+        """
+        if mode not in ('mismatch', 'edit'):
+            raise ValueError("mode must be 'mismatch' or 'edit'")
+        edits = mode == 'edit'
+        codes = np.array([self._codes.get(ch, -1) for ch in q], dtype=np.int64)
+        bound = self._lower_bounds(codes)
+        # letters a difference may substitute or insert
+        letters = np.array([c for ch, c in sorted(self._codes.items())
+                            if ch not in (EOS, SEP)], dtype=np.int64)
+
+        intervals = []
+        found = 0
+        best = {}
+        stack = [(len(q) - 1, k, 0, len(self), self._toehold_start())]
+        while stack and found < max_hits:
+            i, z, top, bot, toe = stack.pop()
+            if i < 0:
+                # only as many rows as the cap leaves are located
+                count = min(bot - top, max_hits - found)
+                intervals.append((top, bot, toe, count, k - z))
+                found += count
+                continue
+            if z < bound[i]:
+                continue
+            # a state reached before with as many differences left is done
+            if best.get((i, top, bot), -1) >= z:
+                continue
+            best[(i, top, bot)] = z
+
+            if edits and z > 0:
+                # insertion: skip a query letter
+                stack.append((i - 1, z - 1, top, bot, toe))
+            tops = self._C[letters] + self.tally.rank_many(letters, top)
+            bots = self._C[letters] + self.tally.rank_many(letters, bot)
+            for c, t, b in zip(letters.tolist(), tops.tolist(), bots.tolist()):
+                if t >= b or z == 0:
+                    continue
+                next_toe = self._toehold(c, top, bot, toe)
+                if edits:
+                    # deletion: skip a text letter
+                    stack.append((i, z - 1, t, b, next_toe))
+                if c != codes[i]:
+                    stack.append((i - 1, z - 1, t, b, next_toe))
+            c = codes[i]
+            if c >= 0:
+                t = int(self._C[c]) + self.tally.rank(c, top)
+                b = int(self._C[c]) + self.tally.rank(c, bot)
+                if t < b:
+                    # exact letter last, so it is explored first
+                    stack.append((i - 1, z, t, b,
+                                  self._toehold(c, top, bot, toe)))
+
+        hits = {}
+        for top, bot, toe, count, diffs in intervals:
+            for pos in self._locate_range(top, bot, toe, count).tolist():
+                if diffs < hits.get(pos, k + 1):
+                    hits[pos] = diffs
+        positions = sorted(hits)[:max_hits]
+        return list(zip(self._resolve(positions),
+                        [hits[p] for p in positions]))
+
+    def _bounds_many(self, queries):
+        """ backward search of a batch of queries at once.
+
+            The queries are laid out reversed in a padded code matrix and
+            every step extends all queries that are still alive by one
+            letter with a vectorized rank.
+        """
+        lengths = np.array([len(q) for q in queries], dtype=np.int64)
+        top = np.zeros(len(queries), dtype=np.int64)
+        bot = np.full(len(queries), len(self), dtype=np.int64)
+        if not len(queries) or not lengths.max():
+            return top, bot
+
+        # code of every query letter, -1 for letters not in the index
+        letters = encode(''.join(queries)).astype(np.int64)
+        symbols = encode(''.join(self.alphabet)).astype(np.int64)
+        codes = np.minimum(np.searchsorted(symbols, letters), len(symbols) - 1)
+        codes[symbols[codes] != letters] = -1
+        ends = np.cumsum(lengths)
+
+        alive = np.ones(len(queries), dtype=bool)
+        for j in range(int(lengths.max())):
+            active = np.flatnonzero(alive & (lengths > j))
+            if not len(active):
+                break
+            c = codes[ends[active] - 1 - j]
+            known = c >= 0
+            alive[active[~known]] = False
+            active, c = active[known], c[known]
+            top[active] = self._C[c] + self.tally.rank_many(c, top[active])
+            bot[active] = self._C[c] + self.tally.rank_many(c, bot[active])
+            alive[active[top[active] >= bot[active]]] = False
+        top[~alive] = bot[~alive] = -1
+        return top, bot
+
+    def _count_batch(self, queries):
+        top, bot = self._bounds_many(queries)
+        return (bot - top).tolist()
+
+    def _search_batch(self, queries):
+        top, bot = self._bounds_many(queries)
+        sizes = bot - top
+        # rows of all hits of all queries, located in one walk
+        first = np.repeat(top - np.cumsum(sizes) + sizes, sizes)
+        offsets = self._locate(first + np.arange(sizes.sum()))
+        bounds = np.cumsum(sizes)[:-1]
+        return [self._resolve(m) for m in np.split(offsets, bounds)]
+
+    def count_many(self, queries, processes=1, chunk_size=4096):
+        """ count occurances of every query of an iterable of queries.
+
+            Returns a generator of counts in input order, see search_many.
+        """
+        return self._map_batches(
+            '_count_batch', queries, processes, chunk_size)
+
+    def search_many(self, queries, processes=1, chunk_size=4096):
+        """ search the positions of every query of an iterable of queries.
+
+            Queries are read lazily in chunks of chunk_size, each chunk is
+            searched with one vectorized backward search, and the chunks
+            are spread over a pool of processes. At most two chunks per
+            process are in flight, so memory stays flat on large inputs.
+            Returns a generator of sorted position lists in input order.
+        """
+        return self._map_batches(
+            '_search_batch', queries, processes, chunk_size)
+
+    def _map_batches(self, method, queries, processes, chunk_size):
+        queries = iter(queries)
+        chunks = iter(lambda: list(itertools.islice(queries, chunk_size)), [])
+        if processes == 1:
+            for chunk in chunks:
+                for result in getattr(self, method)(chunk):
+                    yield result
+            return
+
+        # workers map an index loaded from disk themselves, an in-memory
+        # index is handed over once per worker
+        pool = multiprocessing.Pool(
+            processes, _init_worker, (self._path or self,))
+        in_flight = 2 * (processes or multiprocessing.cpu_count())
+        try:
+            pending = collections.deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(_run_batch, (method, chunk)))
+                if len(pending) >= in_flight:
+                    for result in pending.popleft().get():
+                        yield result
+            while pending:
+                for result in pending.popleft().get():
+                    yield result
+        finally:
+            pool.terminate()
+
+    def save(self, path):
+        """ write the index to path in the versioned binary layout that
+            load memory maps """
+        scalars, tally = self.tally.dump()
+        arrays = [('C', self._C)]
+        arrays += [(k, getattr(self, k)) for k in self._locate_arrays]
+        if self.record_ids is not None:
+            arrays.append(('record_starts', self.record_starts))
+        arrays += [('tally.' + k, tally[k]) for k in sorted(tally)]
+
+        header = {
+            'kind': type(self).__name__,
+            'alphabet': self.alphabet,
+            'backend': self.backend,
+            'locate': dict((k, getattr(self, k))
+                           for k in self._locate_scalars),
+            'tally': scalars,
+            'record_ids': self.record_ids,
+            'arrays': [],
+        }
+        # offsets are relative to the end of the header
+        offset = 0
+        for name, a in arrays:
+            a = np.asarray(a)
+            header['arrays'].append({
+                'name': name, 'dtype': a.dtype.str,
+                'shape': list(a.shape), 'offset': offset})
+            offset += -(-a.nbytes // ALIGN) * ALIGN
+        blob = json.dumps(header).encode('utf-8')
+        start = len(MAGIC) + 12 + len(blob)
+        start += -start % ALIGN
+
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<IQ', FORMAT_VERSION, start))
+            f.write(blob)
+            f.write(b'\0' * (start - f.tell()))
+            for (name, a), meta in zip(arrays, header['arrays']):
+                f.seek(start + meta['offset'])
+                f.write(np.ascontiguousarray(a).tobytes())
+            f.truncate(start + offset)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """ load an index written by save.
+
+            With mmap the arrays are read-only memory maps of the file, so
+            loading is near instant and processes that load the same file
+            share its pages in the page cache.
+        """
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError('{} is not an FMIndex file'.format(path))
+            version, start = struct.unpack('<IQ', f.read(12))
+            if version != FORMAT_VERSION:
+                raise ValueError(
+                    'Unsupported FMIndex format version {}'.format(version))
+            header = json.loads(
+                f.read(start - len(MAGIC) - 12).rstrip(b'\0').decode('utf-8'))
+
+        arrays = {}
+        for meta in header['arrays']:
+            dtype, shape = np.dtype(meta['dtype']), tuple(meta['shape'])
+            offset = start + meta['offset']
+            if not int(np.prod(shape)):
+                arrays[meta['name']] = np.zeros(shape, dtype=dtype)
+            elif mmap:
+                arrays[meta['name']] = np.memmap(
+                    path, dtype=dtype, mode='r', offset=offset, shape=shape)
+            else:
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    arrays[meta['name']] = np.fromfile(
+                        f, dtype=dtype,
+                        count=int(np.prod(shape))).reshape(shape)
+
+        kinds = {'FMIndex': FMIndex}
+        if header['kind'] == 'RLFMIndex':
+            # imported here as bio_alg.rindex imports this module
+            from bio_alg.rindex import RLFMIndex
+            kinds['RLFMIndex'] = RLFMIndex
+        if header['kind'] not in kinds or \
+                not issubclass(kinds[header['kind']], cls):
+            raise ValueError('{} holds a {}, not a {}'.format(
+                path, header['kind'], cls.__name__))
+        index = kinds[header['kind']].__new__(kinds[header['kind']])
+        index._set_alphabet(header['alphabet'], arrays['C'])
+        index.backend = header['backend']
+        index.tally = BACKENDS[index.backend].restore(
+            header['tally'], dict((k[len('tally.'):], v)
+                                  for k, v in arrays.items()
+                                  if k.startswith('tally.')))
+        index.__dict__.update(header['locate'])
+        for k in index._locate_arrays:
+            setattr(index, k, arrays[k])
+        index._path = path
+        index.record_ids = header['record_ids']
+        index.record_starts = arrays.get('record_starts')
+        return index
+
     def getOriginal(self):
-        return ibwt(self.data)
+        return "".join(self.iter_original())
+
+    def iter_original(self, chunk_size=1 << 20):
+        """ recover the indexed text front to back in chunks of about
+            chunk_size letters.
+
+            A walker starts at every suffix array sample (plus the end of
+            file marker row) and steps back with lf mapping until it meets
+            the previous sample, so a chunk is sa_sample_rate vectorized lf
+            steps and memory stays at the chunk size.
+        """
+        n = len(self) - 1
+        by_pos = np.argsort(self.sa_samples, kind='mergesort')
+        positions = self.sa_samples[by_pos].astype(np.int64)
+        rows = self.sa_rows[by_pos].astype(np.int64)
+        if positions[-1] != n:
+            # row 0 is the end of file marker, text position n
+            positions = np.append(positions, n)
+            rows = np.append(rows, 0)
+        return self._walk_chunks(positions, rows, self.sa_sample_rate,
+                                 chunk_size)
+
+    def _walk_chunks(self, positions, rows, spacing, chunk_size):
+        """ text chunks from known (text position, row) pairs, sorted by
+            position: 0, every multiple of spacing and n """
+        n = len(self) - 1
+        symbols = encode(''.join(self.alphabet))
+        step = max(1, chunk_size // spacing) * spacing
+        for start in range(0, n, step):
+            end = min(start + step, n)
+            lo = np.searchsorted(positions, start, side='right')
+            hi = np.searchsorted(positions, end, side='right')
+            pos = positions[lo:hi]
+            stop = positions[lo - 1:hi - 1]
+            row = rows[lo:hi]
+            out = np.empty(end - start, dtype=np.int64)
+            for d in range(1, int((pos - stop).max()) + 1):
+                live = pos - d >= stop
+                row, pos, stop = row[live], pos[live], stop[live]
+                c = self.tally.access_many(row).astype(np.int64)
+                out[pos - d - start] = c
+                row = self._C[c] + self.tally.rank_many(c, row)
+            yield decode(symbols[out])
+
+    def write_original(self, f, chunk_size=1 << 20):
+        """ write the indexed text to a path or file object in chunks """
+        if isinstance(f, str):
+            with open(f, 'w') as handle:
+                return self.write_original(handle, chunk_size)
+        for chunk in self.iter_original(chunk_size):
+            f.write(chunk)
 
     def RLE(self):
-        output = []
-        last = ''
-        k = 0
-        for i in range(len(self.data)):
-            ch = self.data[i]
-            if ch == last:
-                k += 1
-            else:
-                if k > 0:
-                    output.append((last, k))
-                last = ch
-                k = 1
-        output.append((last, k))
-        return output
+        """ runs of the transformed string as (letter, length) pairs """
+        codes = self.tally.access_many(np.arange(len(self)))
+        starts = np.concatenate(
+            ([0], np.flatnonzero(codes[1:] != codes[:-1]) + 1))
+        lengths = np.diff(np.append(starts, len(codes)))
+        return [(self.alphabet[c], k) for c, k in
+                zip(codes[starts].tolist(), lengths.tolist())]
 
 
 def bwt(s):
-    """Apply Burrows-Wheeler transform to input string."""
-    assert "\0" not in s, "Input string cannot contain null character ('\\0')"
-    s += "\0"  # Add end of file marker
-    table = sorted(s[i:] + s[:i] for i in range(len(s)))
-    last_column = [row[-1:] for row in table]
-    return "".join(last_column)
+    """Apply Burrows-Wheeler transform to input string.
+
+    The rotations are never materialized: with a unique, smallest end of
+    file marker the sorted rotations are the sorted suffixes, so the last
+    column is read off the suffix array as the symbol before each suffix.
+    """
+    text, sa = _suffix_array(s)
+    return decode(text[sa - 1])
+
+
+_WORKER_INDEX = None
+
+
+def _init_worker(index):
+    """ pool initializer of search_many: index or path of a saved index """
+    global _WORKER_INDEX
+    if isinstance(index, FMIndex):
+        _WORKER_INDEX = index
+    else:
+        _WORKER_INDEX = FMIndex.load(index)
+
+
+def _run_batch(method, queries):
+    return getattr(_WORKER_INDEX, method)(queries)
+
+
+def _index_dtype(n):
+    """ smallest unsigned type able to hold positions of a text of size n """
+    return np.uint32 if n < 2 ** 32 else np.uint64
+
+
+def _suffix_array(s):
+    """ encode s with the end of file marker and build its suffix array """
+    assert EOS not in s, "Input string cannot contain null character ('\\0')"
+    text = encode(s + EOS)  # Add end of file marker
+    return text, suffix_array(text)
 
 
 def ibwt(r):
     """Convert bwt index back to string."""
-    table = [""] * len(r)
-    for i in range(len(r)):
-        table = sorted(r[i] + table[i] for i in range(len(r)))
-    s = [row for row in table if row.endswith("\0")][0]
-    return s.rstrip("\0")
+    return "".join(ibwt_chunks(r))
+
+
+def ibwt_chunks(r, chunk_size=1 << 20):
+    """ Invert the bwt r front to back, yielding chunks of chunk_size.
+
+    A stable sort of the last column gives the first column together with
+    psi, the inverse of lf mapping: row j of the first column continues
+    the text at row psi[j]. Starting at the row that holds the end of file
+    marker in the last column (the whole text), following psi spells the
+    text in O(n) steps with O(n) integer memory.
+    """
+    last = encode(r)
+    assert len(last) and (last == last.min()).sum() == 1, \
+        "bwt must contain a single end of file marker"
+    psi = np.argsort(last, kind='mergesort')
+    first = last[psi]
+    n = len(last) - 1
+    row = psi[0]
+    rows = np.empty(min(chunk_size, n), dtype=np.int64)
+    for start in range(0, n, chunk_size):
+        m = min(chunk_size, n - start)
+        for k in range(m):
+            rows[k] = row
+            row = psi[row]
+        yield decode(first[rows[:m]])
 
 
 def first_occ(s):
@@ -140,11 +701,22 @@ def main():
         description="Print BWT and FM-index of a given DNA sequence",
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
-    parser.add_argument('--read-seq', help="Sequence")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--read-seq', help="Sequence")
+    source.add_argument('--fasta', help="FASTA/FASTQ file, one generalized "
+                        "index is built over all its records")
+    parser.add_argument('--query', action='append', default=[],
+                        help="Print the positions of a query (repeatable)")
     args = parser.parse_args()
-    print "Input - " + args.read_seq
-    fm_index = FMIndex(args.read_seq)
+    if args.fasta:
+        print("Input - " + args.fasta)
+        fm_index = FMIndex.from_fasta(args.fasta)
+    else:
+        print("Input - " + args.read_seq)
+        fm_index = FMIndex(args.read_seq)
     print(fm_index)
+    for q in args.query:
+        print("{} - {}".format(q, fm_index.search(q)))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,58 @@
+import gzip
+
+
+def open_sequences(path):
+    """ open a (possibly gzipped) FASTA/FASTQ file for reading as text """
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt')
+    return open(path)
+
+
+def _record_id(header):
+    """ first word of a header line without its marker """
+    words = header[1:].split(None, 1)
+    return words[0] if words else ''
+
+
+def read_records(handle):
+    """ Stream (record_id, sequence) pairs from FASTA or FASTQ text.
+
+    The format is taken from the first header character ('>' for FASTA,
+    '@' for FASTQ). FASTA sequences may span several lines, FASTQ records
+    are the usual four lines. The record id is the first word of the
+    header. Only one record is held in memory at a time.
+
+    Args:
+        handle: iterable of lines, e.g. an open file
+    """
+    lines = (line.rstrip('\r\n') for line in handle)
+    for line in lines:
+        if line:
+            break
+    else:
+        return
+
+    if line.startswith('@'):
+        while line is not None:
+            record_id = _record_id(line)
+            seq = next(lines, '')
+            next(lines, None)  # '+' separator
+            next(lines, None)  # qualities
+            yield record_id, seq
+            line = next(lines, None)
+            while line == '':
+                line = next(lines, None)
+        return
+
+    if not line.startswith('>'):
+        raise ValueError('Expected a FASTA (>) or FASTQ (@) header, got '
+                         '{!r}'.format(line[:20]))
+    record_id, parts = _record_id(line), []
+    for line in lines:
+        if line.startswith('>'):
+            yield record_id, ''.join(parts)
+            record_id = _record_id(line)
+            parts = []
+        elif line:
+            parts.append(line.strip())
+    yield record_id, ''.join(parts)
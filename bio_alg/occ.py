@@ -0,0 +1,513 @@
+import numpy as np
+
+_POP8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+_ONE = np.uint64(1)
+_EVEN_BITS = np.uint64(0x5555555555555555)
+# _LOW_BITS[r] keeps the lowest r bits of a word
+_LOW_BITS = np.array([(1 << r) - 1 for r in range(64)], dtype=np.uint64)
+
+
+def _count_dtype(n):
+    return np.uint32 if n < 2 ** 32 else np.uint64
+
+
+def _popcount(words):
+    """ number of set bits of every uint64 in words """
+    shape = np.shape(words)
+    words = np.ascontiguousarray(words, dtype=np.uint64).reshape(-1)
+    return _POP8[words.view(np.uint8)].reshape(-1, 8).sum(
+        axis=1, dtype=np.int64).reshape(shape)
+
+
+def _pack(values, bits):
+    """ pack small integers (< 2 ** bits) into uint64 words, lowest bits
+        first, 64 // bits values per word """
+    per = 64 // bits
+    n = len(values)
+    words = np.zeros(-(-n // per), dtype=np.uint64)
+    shifts = np.arange(per, dtype=np.uint64) * np.uint64(bits)
+    step = per << 16
+    for start in range(0, n, step):
+        chunk = np.asarray(values[start:start + step], dtype=np.uint64)
+        pad = -len(chunk) % per
+        if pad:
+            chunk = np.concatenate((chunk, np.zeros(pad, dtype=np.uint64)))
+        words[start // per:start // per + len(chunk) // per] = \
+            np.bitwise_or.reduce(chunk.reshape(-1, per) << shifts, axis=1)
+    return words
+
+
+def _block_counts(values, sigma, k):
+    """ cumulative count of every value in [0, sigma) before each multiple
+        of k, as an array of shape (n // k + 1, sigma) """
+    n = len(values)
+    n_blocks = n // k + 1
+    counts = np.zeros((n_blocks, sigma), dtype=_count_dtype(n))
+    # tally blocks in chunks so the temporaries stay small
+    step = max(1, (1 << 20) // k) * k
+    for start in range(0, n, step):
+        chunk = np.asarray(values[start:start + step], dtype=np.int64)
+        block = np.arange(len(chunk)) // k
+        first = start // k
+        n_chunk = block[-1] + 1
+        tally = np.bincount(
+            block * sigma + chunk, minlength=n_chunk * sigma
+        ).reshape(n_chunk, sigma)
+        # a trailing partial block has no checkpoint after it
+        n_chunk = min(n_chunk, n_blocks - first - 1)
+        counts[first + 1:first + 1 + n_chunk] = tally[:n_chunk]
+    return np.cumsum(counts, axis=0, dtype=counts.dtype)
+
+
+class _Stored(object):
+    """ A table that can be written out as named arrays and scalars and
+        rebuilt from them without recomputation (see FMIndex.save) """
+
+    _arrays = ()
+    _scalars = ()
+
+    def dump(self):
+        """ returns (scalars, arrays) describing the table """
+        scalars = dict((k, getattr(self, k)) for k in self._scalars)
+        arrays = dict((k, getattr(self, k)) for k in self._arrays)
+        return scalars, arrays
+
+    @classmethod
+    def restore(cls, scalars, arrays):
+        """ rebuild a table from the output of dump, the arrays may be
+            read-only memory maps """
+        table = cls.__new__(cls)
+        table.__dict__.update(scalars)
+        table.__dict__.update(arrays)
+        return table
+
+
+class OccTable(_Stored):
+    """ Checkpointed occurrence (rank) table of a BWT.
+
+    The BWT is kept as one small integer code per symbol. Every
+    `sample_rate` positions the cumulative count of each symbol is stored,
+    and the counts inside a block are taken from the codes on demand, so a
+    rank query touches one checkpoint and at most `sample_rate` codes.
+
+    Memory is n bytes for the codes plus
+    4 * sigma * n / sample_rate bytes for the checkpoints; a larger sample
+    rate saves memory at the price of longer in-block scans.
+    """
+
+    _arrays = ('codes', 'checkpoints')
+    _scalars = ('sigma', 'sample_rate')
+
+    def __init__(self, codes, alphabet, sample_rate=64):
+        """
+        Args:
+            codes: BWT as indices into alphabet
+            alphabet: sorted symbols of the BWT
+            sample_rate: distance between two checkpoints
+        """
+        if sample_rate < 1:
+            raise ValueError('sample_rate must be positive')
+        self.sigma = len(alphabet)
+        self.sample_rate = sample_rate
+        dtype = np.uint8 if self.sigma <= 256 else np.uint32
+        self.codes = np.ascontiguousarray(codes, dtype=dtype)
+        self.checkpoints = _block_counts(self.codes, self.sigma, sample_rate)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def rank(self, c, i):
+        """ count the occurances of code c in positions [0, i) """
+        b = i // self.sample_rate
+        start = b * self.sample_rate
+        return int(self.checkpoints[b, c]) + \
+            int(np.count_nonzero(self.codes[start:i] == c))
+
+    def rank_many(self, c, i):
+        """ vectorized rank for arrays of codes c and positions i """
+        i = np.asarray(i, dtype=np.int64)
+        c = np.asarray(c, dtype=np.int64)
+        k = self.sample_rate
+        r = self.checkpoints[i // k, c].astype(np.int64)
+        # gather the in-block prefixes as a (len(i), k) matrix
+        offset = np.arange(k)
+        pos = (i - i % k)[..., np.newaxis] + offset
+        block = self.codes[np.minimum(pos, len(self.codes) - 1)]
+        inside = offset < (i % k)[..., np.newaxis]
+        return r + np.count_nonzero(
+            inside & (block == c[..., np.newaxis]), axis=-1)
+
+    def access(self, i):
+        """ code at position i """
+        return int(self.codes[i])
+
+    def access_many(self, i):
+        return self.codes[i]
+
+
+class DNAOccTable(_Stored):
+    """ Occurrence table of a nucleotide BWT packed at 2 bits per symbol.
+
+    A, C, G and T are stored as 2 bit lanes, 32 to a uint64 word. Every
+    other symbol (the end of file marker, N, ...) is rare in practice and
+    kept in an exception list; its lane holds A, and A counts are corrected
+    by the number of exceptions before the position. Ranks inside a block
+    popcount whole words, so a query reads one checkpoint and at most
+    sample_rate / 32 words.
+
+    Memory is about 2 + 128 / sample_rate bits per symbol plus the
+    exceptions.
+    """
+
+    LANES = 'ACGT'
+    _arrays = ('lane', 'lane_codes', 'exc_pos', 'exc_keys', 'exc_codes',
+               'words', 'checkpoints')
+    _scalars = ('sigma', 'n', 'sample_rate')
+
+    def __init__(self, codes, alphabet, sample_rate=64):
+        if sample_rate < 1:
+            raise ValueError('sample_rate must be positive')
+        codes = np.asarray(codes)
+        n = len(codes)
+        self.sigma = len(alphabet)
+        self.n = n
+        self.sample_rate = -(-sample_rate // 32) * 32
+
+        # lane of every alphabet code, -1 for exceptions
+        self.lane = np.full(self.sigma, -1, dtype=np.int64)
+        self.lane_codes = np.zeros(4, dtype=np.int64)
+        for c, ch in enumerate(alphabet):
+            if ch in self.LANES:
+                self.lane[c] = self.LANES.index(ch)
+                self.lane_codes[self.LANES.index(ch)] = c
+        lanes = np.maximum(self.lane, 0)[codes]
+
+        self.exc_pos = np.flatnonzero(self.lane[codes] < 0)
+        exc_codes = codes[self.exc_pos].astype(np.int64)
+        # exceptions keyed by (code, position) for rank of a rare symbol
+        self.exc_keys = np.sort(exc_codes * (n + 1) + self.exc_pos)
+        self.exc_codes = exc_codes.astype(np.uint32)
+
+        self.words = _pack(lanes, 2)
+        self.checkpoints = _block_counts(lanes, 4, self.sample_rate)
+
+    def __len__(self):
+        return self.n
+
+    def rank(self, c, i):
+        """ count the occurances of code c in positions [0, i) """
+        lane = int(self.lane[c])
+        if lane < 0:
+            base = c * (self.n + 1)
+            return int(np.searchsorted(self.exc_keys, base + i) -
+                       np.searchsorted(self.exc_keys, base))
+        # scalar path on python ints, cheaper than numpy for one position
+        k = self.sample_rate
+        r = int(self.checkpoints[i // k, lane])
+        pattern = lane * int(_EVEN_BITS)
+        for w in range((i // k) * (k // 32), i // 32 + 1):
+            y = int(self.words[min(w, len(self.words) - 1)]) ^ pattern
+            m = ~(y | (y >> 1)) & int(_EVEN_BITS)
+            if w == i // 32:
+                m &= (1 << 2 * (i % 32)) - 1
+            r += bin(m).count('1')
+        if lane == 0:
+            r -= int(np.searchsorted(self.exc_pos, i))
+        return r
+
+    def _matches(self, words, lane):
+        """ words with a single bit set at every lane equal to lane """
+        pattern = lane.astype(np.uint64) * _EVEN_BITS
+        y = words ^ pattern
+        return ~(y | (y >> _ONE)) & _EVEN_BITS
+
+    def rank_many(self, c, i):
+        """ vectorized rank for arrays of codes c and positions i """
+        i = np.asarray(i, dtype=np.int64)
+        c = np.asarray(c, dtype=np.int64)
+        c, i = np.broadcast_arrays(c, i)
+        lane = self.lane[c]
+        is_lane = lane >= 0
+        lane = np.maximum(lane, 0)
+
+        k = self.sample_rate
+        r = self.checkpoints[i // k, lane].astype(np.int64)
+        last = len(self.words) - 1
+        w0 = (i // k) * (k // 32)
+        w1 = i // 32
+        for d in range(k // 32):
+            w = w0 + d
+            inside = w < w1
+            if not inside.any():
+                break
+            m = self._matches(self.words[np.minimum(w, last)], lane)
+            r += np.where(inside, _popcount(m), 0)
+        m = self._matches(self.words[np.minimum(w1, last)], lane)
+        r += _popcount(m & _LOW_BITS[2 * (i % 32)])
+        # exceptions were stored as A
+        r -= np.where(lane == 0, np.searchsorted(self.exc_pos, i), 0)
+
+        base = c * (self.n + 1)
+        exc = np.searchsorted(self.exc_keys, base + i) - \
+            np.searchsorted(self.exc_keys, base)
+        return np.where(is_lane, r, exc)
+
+    def access(self, i):
+        """ code at position i """
+        j = int(np.searchsorted(self.exc_pos, i))
+        if j < len(self.exc_pos) and self.exc_pos[j] == i:
+            return int(self.exc_codes[j])
+        lane = (int(self.words[i // 32]) >> 2 * (i % 32)) & 3
+        return int(self.lane_codes[lane])
+
+    def access_many(self, i):
+        i = np.asarray(i, dtype=np.int64)
+        shift = (np.uint64(2) * (i % 32).astype(np.uint64))
+        lanes = (self.words[i // 32] >> shift) & np.uint64(3)
+        codes = self.lane_codes[lanes.astype(np.int64)]
+        if len(self.exc_pos):
+            j = np.minimum(np.searchsorted(self.exc_pos, i),
+                           len(self.exc_pos) - 1)
+            hit = self.exc_pos[j] == i
+            codes = np.where(hit, self.exc_codes[j], codes)
+        return codes
+
+
+class _BitVector(object):
+    """ Bit vector with checkpointed popcount rank """
+
+    def __init__(self, bits, sample_rate=256):
+        self.sample_rate = -(-sample_rate // 64) * 64
+        self.words = _pack(bits, 1)
+        per_block = self.sample_rate // 64
+        counts = _popcount(self.words)
+        pad = -len(counts) % per_block
+        if pad:
+            counts = np.concatenate((counts, np.zeros(pad, dtype=np.int64)))
+        blocks = counts.reshape(-1, per_block).sum(axis=1)
+        self.checkpoints = np.concatenate(
+            ([0], np.cumsum(blocks))).astype(_count_dtype(len(bits)))
+
+    def rank1(self, i):
+        """ number of set bits in [0, i), vectorized over i """
+        i = np.asarray(i, dtype=np.int64)
+        k = self.sample_rate
+        r = self.checkpoints[i // k].astype(np.int64)
+        last = len(self.words) - 1
+        w0 = (i // k) * (k // 64)
+        w1 = i // 64
+        for d in range(k // 64):
+            w = w0 + d
+            inside = w < w1
+            if not inside.any():
+                break
+            words = self.words[np.minimum(w, last)]
+            r += np.where(inside, _popcount(words), 0)
+        partial = self.words[np.minimum(w1, last)] & _LOW_BITS[i % 64]
+        return r + _popcount(partial)
+
+    def rank1_one(self, i):
+        """ rank1 of a single position on python ints """
+        k = self.sample_rate
+        r = int(self.checkpoints[i // k])
+        for w in range((i // k) * (k // 64), i // 64):
+            r += bin(int(self.words[w])).count('1')
+        if i % 64:
+            r += bin(int(self.words[i // 64]) & ((1 << i % 64) - 1)).count('1')
+        return r
+
+    def get(self, i):
+        i = np.asarray(i, dtype=np.int64)
+        return ((self.words[i // 64] >> (i % 64).astype(np.uint64)) & _ONE
+                ).astype(np.int64)
+
+
+class WaveletOccTable(_Stored):
+    """ Occurrence table of a BWT over a large alphabet as a wavelet matrix.
+
+    The codes are split into ceil(log2 sigma) bit planes; each level keeps
+    one bit vector with popcount rank, and the codes are stably
+    partitioned by their bit at that level before building the next one.
+    A rank or access costs one bit vector rank per level, and memory is
+    about log2(sigma) * (1 + 32 / sample_rate) bits per symbol regardless
+    of sigma.
+    """
+
+    _arrays = ('zeros',)
+    _scalars = ('n', 'sigma', 'levels')
+
+    def __init__(self, codes, alphabet, sample_rate=256):
+        if sample_rate < 1:
+            raise ValueError('sample_rate must be positive')
+        values = np.asarray(codes, dtype=np.int64)
+        self.n = len(values)
+        self.sigma = len(alphabet)
+        self.levels = max(1, (self.sigma - 1).bit_length())
+        self.bitvectors = []
+        zeros = []
+        for level in range(self.levels):
+            bits = (values >> (self.levels - 1 - level)) & 1
+            self.bitvectors.append(_BitVector(bits, sample_rate))
+            zeros.append(self.n - int(np.count_nonzero(bits)))
+            values = np.concatenate((values[bits == 0], values[bits == 1]))
+        self.zeros = np.array(zeros, dtype=np.int64)
+
+    def dump(self):
+        scalars, arrays = super(WaveletOccTable, self).dump()
+        scalars['sample_rate'] = self.bitvectors[0].sample_rate
+        for level, bv in enumerate(self.bitvectors):
+            arrays['words%d' % level] = bv.words
+            arrays['checkpoints%d' % level] = bv.checkpoints
+        return scalars, arrays
+
+    @classmethod
+    def restore(cls, scalars, arrays):
+        table = cls.__new__(cls)
+        table.__dict__.update((k, scalars[k]) for k in cls._scalars)
+        table.zeros = arrays['zeros']
+        table.bitvectors = []
+        for level in range(table.levels):
+            bv = _BitVector.__new__(_BitVector)
+            bv.sample_rate = scalars['sample_rate']
+            bv.words = arrays['words%d' % level]
+            bv.checkpoints = arrays['checkpoints%d' % level]
+            table.bitvectors.append(bv)
+        return table
+
+    def __len__(self):
+        return self.n
+
+    def rank(self, c, i):
+        """ count the occurances of code c in positions [0, i) """
+        start = 0
+        for level, bv in enumerate(self.bitvectors):
+            if (c >> (self.levels - 1 - level)) & 1:
+                i = int(self.zeros[level]) + bv.rank1_one(i)
+                start = int(self.zeros[level]) + bv.rank1_one(start)
+            else:
+                i -= bv.rank1_one(i)
+                start -= bv.rank1_one(start)
+        return i - start
+
+    def rank_many(self, c, i):
+        """ vectorized rank for arrays of codes c and positions i """
+        i = np.asarray(i, dtype=np.int64)
+        c = np.asarray(c, dtype=np.int64)
+        c, i = np.broadcast_arrays(c, i)
+        start = np.zeros_like(i)
+        for level, bv in enumerate(self.bitvectors):
+            bit = (c >> (self.levels - 1 - level)) & 1
+            ones_i, ones_start = bv.rank1(i), bv.rank1(start)
+            i = np.where(bit, self.zeros[level] + ones_i, i - ones_i)
+            start = np.where(
+                bit, self.zeros[level] + ones_start, start - ones_start)
+        return i - start
+
+    def access(self, i):
+        """ code at position i """
+        c = 0
+        for level, bv in enumerate(self.bitvectors):
+            bit = (int(bv.words[i // 64]) >> (i % 64)) & 1
+            ones = bv.rank1_one(i)
+            c = (c << 1) | bit
+            i = int(self.zeros[level]) + ones if bit else i - ones
+        return c
+
+    def access_many(self, i):
+        i = np.asarray(i, dtype=np.int64)
+        c = np.zeros_like(i)
+        for level, bv in enumerate(self.bitvectors):
+            bit = bv.get(i)
+            ones = bv.rank1(i)
+            c = (c << 1) | bit
+            i = np.where(bit, self.zeros[level] + ones, i - ones)
+        return c
+
+
+class RunLengthOccTable(_Stored):
+    """ Occurrence table over the runs of a BWT.
+
+    Only the runs are stored: their first position, their letter and,
+    for every letter, the cumulative length of its runs. rank(c, i) finds
+    the run holding position i and the last run of c before it by binary
+    search, so space is O(r) for r runs instead of O(n), which is what
+    makes highly repetitive collections fit in memory.
+    """
+
+    _arrays = ('starts', 'heads', 'keys', 'cumlen')
+    _scalars = ('n', 'sigma')
+
+    def __init__(self, codes, alphabet, sample_rate=None):
+        """ sample_rate is accepted for a common signature and unused """
+        codes = np.asarray(codes)
+        self.n = len(codes)
+        self.sigma = len(alphabet)
+        starts = np.concatenate(
+            ([0], np.flatnonzero(codes[1:] != codes[:-1]) + 1))
+        heads = codes[starts].astype(np.int64)
+        lengths = np.diff(np.append(starts, self.n))
+        r = len(starts)
+        # runs ordered by (letter, run index), with the cumulative length
+        # of the runs before them in that order
+        keys = heads * (r + 1) + np.arange(r)
+        order = np.argsort(keys, kind='mergesort')
+        dtype = _count_dtype(max(self.n, self.sigma * (r + 1)))
+        self.starts = starts.astype(dtype)
+        self.heads = heads.astype(np.uint8 if self.sigma <= 256 else np.uint32)
+        self.keys = keys[order].astype(dtype)
+        self.cumlen = np.concatenate(
+            ([0], np.cumsum(lengths[order]))).astype(dtype)
+
+    def __len__(self):
+        return self.n
+
+    def runs(self):
+        """ number of runs """
+        return len(self.starts)
+
+    def _run(self, i):
+        """ index of the run holding position i (the last one for n) """
+        return np.maximum(np.searchsorted(self.starts, i, side='right') - 1, 0)
+
+    def rank(self, c, i):
+        """ count the occurances of code c in positions [0, i) """
+        return int(self.rank_many(c, i))
+
+    def rank_many(self, c, i):
+        """ vectorized rank for arrays of codes c and positions i """
+        i = np.asarray(i, dtype=np.int64)
+        c = np.asarray(c, dtype=np.int64)
+        p = self._run(i)
+        base = c * (len(self.starts) + 1)
+        # letters in the runs of c before run p
+        r = self.cumlen[np.searchsorted(self.keys, base + p)].astype(
+            np.int64) - self.cumlen[np.searchsorted(self.keys, base)]
+        return r + np.where(self.heads[p] == c, i - self.starts[p], 0)
+
+    def access(self, i):
+        """ code at position i """
+        return int(self.heads[self._run(i)])
+
+    def access_many(self, i):
+        return self.heads[self._run(i)]
+
+
+BACKENDS = {
+    'plain': OccTable,
+    'dna': DNAOccTable,
+    'wavelet': WaveletOccTable,
+    'rle': RunLengthOccTable,
+}
+
+
+def choose_backend(alphabet):
+    """ pick an occurrence table for the symbols of a BWT:
+        nucleotides get the 2 bit packed table, large alphabets the
+        wavelet matrix, everything else the plain checkpointed codes """
+    symbols = set(alphabet)
+    if len(symbols & set(DNAOccTable.LANES)) >= 2 and \
+            len(symbols - set(DNAOccTable.LANES)) <= 3:
+        return 'dna'
+    if len(symbols) > 16:
+        return 'wavelet'
+    return 'plain'
@@ -0,0 +1,156 @@
+import numpy as np
+
+from bio_alg.FMIndex import FMIndex, _index_dtype, _suffix_array
+
+
+class RLFMIndex(FMIndex):
+    """ Run-length compressed FM-index (r-index).
+
+    Counting runs on the BWT runs alone (the 'rle' occurrence table).
+    Locating keeps the suffix array only at the ends of the r runs: the
+    backward search carries a toehold, the suffix array entry of the last
+    row of the current range, and the other hits follow from it by the
+    phi function phi(SA[x]) = SA[x - 1], which is answered from the
+    entries at run boundaries. Approximate search carries a toehold along
+    every branch of its backtracking in the same way. Every structure is
+    O(r), not O(n), so collections of many similar genomes fit in memory.
+
+    The suffix array is needed once while building.
+    """
+
+    _locate_arrays = ('run_end_sa', 'phi_keys', 'phi_vals')
+    _locate_scalars = ()
+
+    def __init__(self, data):
+        """
+        Args:
+            data: text to index
+        """
+        text, sa = _suffix_array(data)
+        self._build(text[sa - 1], None, 'rle')
+        self._sample_runs(sa)
+        self._path = None
+        self.record_ids = None
+        self.record_starts = None
+
+    def _sample_runs(self, sa):
+        """ suffix array entries at the run boundaries """
+        dtype = _index_dtype(len(sa))
+        starts = self.tally.starts.astype(np.int64)
+        ends = np.append(starts[1:], len(sa)) - 1
+        self.run_end_sa = sa[ends].astype(dtype)
+        # SA[x - 1] is the end of the previous run for the first row x of
+        # a run; phi of any other text position is an offset from the
+        # closest run start at or before it
+        keys = sa[starts[1:]].astype(dtype)
+        order = np.argsort(keys)
+        self.phi_keys = keys[order]
+        self.phi_vals = self.run_end_sa[:-1][order]
+
+    def runs(self):
+        """ number of runs of the BWT """
+        return self.tally.runs()
+
+    def RLE(self):
+        lengths = np.diff(np.append(self.tally.starts, len(self)))
+        return [(self.alphabet[c], k) for c, k in
+                zip(self.tally.heads.tolist(), lengths.tolist())]
+
+    def _phi(self, i):
+        j = int(np.searchsorted(self.phi_keys, i, side='right')) - 1
+        return int(self.phi_vals[j]) + i - int(self.phi_keys[j])
+
+    def _toehold(self, c, top, bot, toe):
+        """ suffix array entry of the last row after extending the range
+            [top, bot) whose last entry is toe with letter c """
+        tally = self.tally
+        p = int(tally._run(bot - 1))
+        if tally.heads[p] == c:
+            return toe - 1
+        # the last c before bot ends the last run of c before run p
+        base = c * (len(tally.starts) + 1)
+        q = int(tally.keys[np.searchsorted(tally.keys, base + p) - 1]) - base
+        return int(self.run_end_sa[q]) - 1
+
+    def _toehold_start(self):
+        return int(self.run_end_sa[-1])
+
+    def _bounds_toehold(self, q):
+        """ backward search that also tracks the toehold """
+        top, bot = 0, len(self)
+        toe = self._toehold_start()
+        for qc in q[::-1]:
+            c = self._codes.get(qc)
+            if c is None:
+                return -1, -1, None
+            new_top = self._lf(top, qc)
+            new_bot = self._lf(bot, qc)
+            if new_top >= new_bot:
+                return -1, -1, None
+            toe = self._toehold(c, top, bot, toe)
+            top, bot = new_top, new_bot
+        return top, bot, toe
+
+    def _locate_range(self, top, bot, toe, count=None):
+        """ the toehold, then phi of the previous entry for every other
+            row of the range, up to count rows back from the last """
+        if count is None:
+            count = bot - top
+        if count <= 0:
+            return np.zeros(0, dtype=np.int64)
+        matches = [toe]
+        for _ in range(min(count, bot - top) - 1):
+            matches.append(self._phi(matches[-1]))
+        return np.array(matches, dtype=np.int64)
+
+    def search(self, q):
+        """ search the positions of query q """
+        top, bot, toe = self._bounds_toehold(q)
+        if top >= bot:
+            return []
+        return self._resolve(self._locate_range(top, bot, toe))
+
+    def _search_batch(self, queries):
+        return [self.search(q) for q in queries]
+
+    def iter_original(self, chunk_size=1 << 20):
+        """ recover the indexed text front to back in chunks of about
+            chunk_size letters.
+
+            There are no evenly spaced samples to start from, so a first
+            pass walks back with lf mapping from every run end sample
+            down to the previous one, all at once, and keeps the row of
+            every text position that is a multiple of a spacing of about
+            sqrt(chunk_size). The chunks are then walked from those rows
+            as in FMIndex. Memory is O(r + n / spacing) besides the chunk,
+            the BWT is never decoded as a whole.
+        """
+        spacing = max(1, int(chunk_size ** 0.5))
+        positions, rows = self._checkpoints(spacing)
+        return self._walk_chunks(positions, rows, spacing, chunk_size)
+
+    def _checkpoints(self, spacing):
+        """ rows of the text positions 0, spacing, 2 spacing, ... and n """
+        n = len(self) - 1
+        grid = np.append(np.arange(0, n, spacing, dtype=np.int64), n)
+        found = np.empty(len(grid), dtype=np.int64)
+        starts = self.tally.starts.astype(np.int64)
+        # run ends, and row 0 which is text position n
+        pos = np.append(self.run_end_sa.astype(np.int64), n)
+        row = np.append(np.append(starts[1:], len(self)) - 1, 0)
+        pos, first = np.unique(pos, return_index=True)
+        row = row[first]
+        stop = np.append(-1, pos[:-1])
+        on = pos % spacing == 0
+        found[pos[on] // spacing] = row[on]
+        found[-1] = 0
+        while True:
+            live = pos - 1 > stop
+            if not live.any():
+                break
+            row, pos, stop = row[live], pos[live] - 1, stop[live]
+            c = self.tally.access_many(row).astype(np.int64)
+            row = self._C[c] + self.tally.rank_many(c, row)
+            on = pos % spacing == 0
+            found[pos[on] // spacing] = row[on]
+        return grid, found
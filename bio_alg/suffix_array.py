@@ -0,0 +1,81 @@
+import numpy as np
+
+
+def encode(s):
+    """ Map a string onto an integer array of its code points.
+
+        Latin-1 text is stored one byte per symbol, anything wider falls
+        back to 32-bit code points. Code point order is python's string
+        order, so sorting codes and sorting characters agree.
+    """
+    try:
+        return np.frombuffer(s.encode('latin-1'), dtype=np.uint8)
+    except UnicodeEncodeError:
+        return np.frombuffer(s.encode('utf-32-le'), dtype='<u4')
+
+
+def decode(codes):
+    """ Inverse of encode """
+    codes = np.asarray(codes)
+    if codes.dtype == np.uint8:
+        return codes.tobytes().decode('latin-1')
+    return codes.astype('<u4').tobytes().decode('utf-32-le')
+
+
+def suffix_array(text):
+    """ Build the suffix array of an integer text by prefix doubling.
+
+    Every round ranks the suffixes by their first 2k symbols by sorting
+    the pair (rank[i], rank[i + k]) packed into a single int64 key, so a
+    round is one vectorized argsort over the text. The number of rounds is
+    logarithmic in the longest repeat, and the working set stays a handful
+    of integer arrays of length n.
+
+    Args:
+        text: 1d integer array. The last symbol must be a unique sentinel
+            smaller than every other symbol (see bwt).
+    Returns:
+        sa: int64 array with the starting positions of the sorted suffixes
+    """
+    text = np.asarray(text)
+    n = len(text)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    rank_dtype = np.int32 if n < 2 ** 31 else np.int64
+
+    # dense ranks of the first symbol
+    _, rank = np.unique(text, return_inverse=True)
+    rank = rank.reshape(-1).astype(np.int64)
+
+    # small alphabets (DNA) pack as many leading symbols into the first
+    # key as fit in 62 bits, which saves the first few doubling rounds
+    base = int(rank.max()) + 2
+    k = 1
+    while base ** (k + 1) < 2 ** 62 and k < n:
+        k += 1
+    key = np.zeros(n, dtype=np.int64)
+    for j in range(k):
+        key *= base
+        key[:n - j] += rank[j:] + 1
+    sa = np.argsort(key, kind='quicksort')
+    key = key[sa]
+    rank = np.empty(n, dtype=rank_dtype)
+    rank[sa[0]] = 0
+    rank[sa[1:]] = np.cumsum(key[1:] != key[:-1])
+    del key
+    distinct = int(rank[sa[-1]]) + 1
+
+    while distinct < n:
+        key = rank.astype(np.int64) * (n + 1)
+        key[:n - k] += rank[k:]
+        key[:n - k] += 1
+        sa = np.argsort(key, kind='quicksort')
+        key = key[sa]
+        new_rank = np.empty(n, dtype=rank_dtype)
+        new_rank[sa[0]] = 0
+        new_rank[sa[1:]] = np.cumsum(key[1:] != key[:-1])
+        del key
+        rank = new_rank
+        distinct = int(rank[sa[-1]]) + 1
+        k *= 2
+    return sa
@@ -0,0 +1,187 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+class Adaline(object):
+    """ ADAptive LInear NEuron classifier
+
+    Learns the weights of a linear unit by gradient descent on the sum of
+    squared errors between the net input and the targets, which are -1 and
+    1, then classifies by the sign of the net input.
+
+    Parameters
+    ___________
+    eta : float
+        Learning rate (between 0.0 and 1.0)
+
+    epochs : int
+        Passes over the training dataset
+
+    random_state : int
+        Random state for initializing random weights and shuffling
+
+    batch_size : int or None
+        None runs full-batch gradient descent: every epoch is one step
+        along the gradient over the whole dataset, computed with two
+        matrix products. An int runs stochastic gradient descent on
+        shuffled mini-batches of batch_size rows, 1 being plain SGD, which
+        takes many cheap steps per epoch on large data. The gradient is
+        averaged over the rows it is computed on, so eta means the same in
+        both modes.
+
+    shuffle : bool
+        Shuffle the rows before every epoch of mini-batch training.
+
+    Attributes
+    __________
+    w_ : 1d-array
+        weights after fitting, w_[0] is the bias
+
+    cost_ : list
+        Mean cost over the training samples in every epoch.
+
+    """
+    def __init__(self, eta=0.01, epochs=50, random_state=1, batch_size=None,
+                 shuffle=True):
+        np.random.seed(random_state)
+        self.eta = eta
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+
+    def fit(self, X, y, init_weights=None):
+        """ Fit training data.
+
+        Parameters
+        __________
+        X : {array-like, sparse matrix}, shape = [n_samples, n_features]
+            Training vectors, where n_samples is the number of samples and
+            n_features is the number of features.
+
+        y : array-like, shape = [n_samples]
+            Target values, two classes.
+
+        init_weights : array-like, shape = [n_features + 1]
+            Initial weights for the classifier. If None, weights are
+            initialized to small random numbers
+
+        Returns
+        _______
+        self : object
+
+        """
+        if not len(X.shape) == 2:
+            raise ValueError('X must be a 2D array. Try X[:, np.newaxis]')
+
+        self._set_classes(y)
+        self._init_weights(X.shape[1], init_weights)
+        self.cost_ = []
+        for _ in range(self.epochs):
+            self.cost_.append(self._epoch(X, y))
+        return self
+
+    def partial_fit(self, X, y, classes=None):
+        """ Fit one chunk of training data, keeping what was learnt before.
+
+        The first call initializes the weights and the class labels, the
+        next ones keep training them. Every call is one pass over the
+        chunk.
+
+        Parameters
+        __________
+        X : {array-like, sparse matrix}, shape = [n_samples, n_features]
+            Training vectors of the chunk.
+
+        y : array-like, shape = [n_samples]
+            Target values of the chunk.
+
+        classes : array-like, shape = [2]
+            Class labels of the whole dataset, needed on the first call
+            when a chunk may hold only one of them.
+
+        Returns
+        _______
+        self : object
+
+        """
+        if getattr(self, 'w_', None) is None:
+            self._set_classes(y if classes is None else classes)
+            self._init_weights(X.shape[1], None)
+            self.cost_ = []
+        if not np.all(np.isin(y, self.classes_)):
+            raise ValueError('Unknown class labels in y')
+        self.cost_.append(self._epoch(X, y))
+        return self
+
+    def _set_classes(self, y):
+        self.classes_ = np.unique(y)
+        if not len(self.classes_) == 2:
+            raise ValueError('Only supports two class labels')
+
+    def _init_weights(self, n_features, init_weights):
+        if init_weights is None:
+            self.w_ = np.random.normal(scale=0.01, size=1 + n_features)
+        else:
+            self.w_ = np.array(init_weights, dtype=float)
+
+    def _targets(self, y):
+        """ targets the activation is fitted to """
+        return np.where(np.asarray(y) == self.classes_[1], 1.0, -1.0)
+
+    def _cost(self, output, target):
+        """ summed cost of the outputs """
+        return 0.5 * float(np.sum((target - output) ** 2))
+
+    def _epoch(self, X, y):
+        """ One pass over X, returns the mean cost before the updates """
+        if sp.issparse(X):
+            X = X.tocsr()
+        t = self._targets(y)
+        n = X.shape[0]
+        if self.batch_size is None:
+            return self._step(X, t) / n
+        if self.shuffle:
+            order = np.random.permutation(n)
+        else:
+            order = np.arange(n)
+        cost = 0.0
+        for start in range(0, n, self.batch_size):
+            rows = order[start:start + self.batch_size]
+            cost += self._step(X[rows], t[rows])
+        return cost / n
+
+    def _step(self, X, t):
+        """ One gradient step on the rows of X, returns their cost """
+        output = self.activation(self.net_input(X))
+        errors = t - output
+        # X.T.dot only visits the non-zero entries of a sparse matrix
+        self.w_[1:] += self.eta * X.T.dot(errors) / len(t)
+        self.w_[0] += self.eta * errors.mean()
+        return self._cost(output, t)
+
+    def net_input(self, X):
+        """ Net input function """
+        if sp.issparse(X):
+            return X.dot(self.w_[1:]) + self.w_[0]
+        return np.dot(X, self.w_[1:]) + self.w_[0]
+
+    def activation(self, z):
+        """ Linear activation function """
+        return z
+
+    def predict(self, X):
+        """ Predict class labels for X.
+
+        Parameters
+        __________
+        X : {array-like, sparse matrix}, shape = [n_samples, n_features]
+            Samples to classify.
+
+        Returns
+        _______
+        class : 1d-array
+            Predicted class labels.
+
+        """
+        return np.where(
+            self.net_input(X) >= 0.0, self.classes_[1], self.classes_[0])
@@ -0,0 +1,44 @@
+import numpy as np
+
+from classification.adaline import Adaline
+
+
+class LogisticRegression(Adaline):
+    """ Logistic regression classifier
+
+    Adaline with a sigmoid activation: the output is the probability of
+    the second class, and gradient descent minimizes the log loss instead
+    of the squared error. Training modes and parameters are those of
+    Adaline.
+
+    Parameters
+    ___________
+    eta, epochs, random_state, batch_size, shuffle :
+        See Adaline.
+
+    Attributes
+    __________
+    w_ : 1d-array
+        weights after fitting, w_[0] is the bias
+
+    cost_ : list
+        Mean log loss over the training samples in every epoch.
+
+    """
+
+    def _targets(self, y):
+        return np.where(np.asarray(y) == self.classes_[1], 1.0, 0.0)
+
+    def _cost(self, output, target):
+        output = np.clip(output, 1e-15, 1 - 1e-15)
+        return -float(np.sum(target * np.log(output) +
+                             (1 - target) * np.log(1 - output)))
+
+    def activation(self, z):
+        """ Logistic sigmoid activation function """
+        return 1.0 / (1.0 + np.exp(-np.clip(z, -250, 250)))
+
+    def predict_proba(self, X):
+        """ Probability of the second class, classes_[1], for every row
+            of X """
+        return self.activation(self.net_input(X))
@@ -1,4 +1,10 @@
+import itertools
+import multiprocessing
+
 import numpy as np
+import scipy.sparse as sp
+
+from utils.shared import SharedArrays, attach
 
 
 class Perceptron(object):
@@ -15,19 +21,35 @@ class Perceptron(object):
     random_state : int
         Random state for initializing random weights
 
+    batch_size : int or None
+        None trains online, one sample at a time, exactly as the classic
+        perceptron rule. An int trains on blocks of batch_size rows with
+        matrix operations: the whole block is classified with the current
+        weights and the updates of its misclassified rows are summed.
+
+    average : bool
+        Average the weights over all the update steps (averaged
+        perceptron), which generalizes better on data that is not linearly
+        separable.
+
     Attributes
     __________
     w_ : 1d-array
         weights after filtering
 
     cost_ : list
-        Number of misclassification in every epoch.
+        Number of misclassification in every epoch. Training stops after
+        the first epoch without any, since the weights cannot change
+        anymore.
 
     """
-    def __init__(self, eta=0.1, epochs=50, random_state=1):
+    def __init__(self, eta=0.1, epochs=50, random_state=1, batch_size=None,
+                 average=False):
         np.random.seed(random_state)
         self.eta = eta
         self.epochs = epochs
+        self.batch_size = batch_size
+        self.average = average
 
     def fit(self, X, y, init_weights=None):
         """ Fit training data.
@@ -55,6 +77,100 @@ class Perceptron(object):
         if not len(X.shape) == 2:
             raise ValueError('X must be a 2D array. Try X[:, np.newaxis]')
 
+        self._set_classes(y)
+        self._init_weights(X.shape[1], init_weights)
+        self.cost_ = []
+
+        # learn weights
+        for _ in range(self.epochs):
+            errors = self._epoch(X, y)
+            self.cost_.append(errors)
+            if not errors:
+                break
+
+        self._finish()
+        return self
+
+    def partial_fit(self, X, y, classes=None):
+        """ Fit one chunk of training data, keeping what was learnt before.
+
+        The first call initializes the weights and the class labels, the
+        next ones keep training them, so a dataset larger than memory can
+        be fed a chunk at a time. Every call is one pass over the chunk.
+
+        Parameters
+        __________
+        X : array-like, shape = [n_samples, n_features]
+            Training vectors of the chunk.
+
+        y : array-like, shape = [n_samples]
+            Target values of the chunk.
+
+        classes : array-like, shape = [2]
+            Class labels of the whole dataset, needed on the first call
+            when a chunk may hold only one of them.
+
+        Returns
+        _______
+        self : object
+
+        """
+        if getattr(self, '_w', None) is None:
+            self._set_classes(y if classes is None else classes)
+            self._init_weights(X.shape[1], None)
+            self.cost_ = []
+        if not np.all(np.isin(y, self.classes_)):
+            raise ValueError('Unknown class labels in y')
+        self.cost_.append(self._epoch(X, y))
+        self._finish()
+        return self
+
+    def fit_stream(self, path, chunk_size=10000, classes=None,
+                   target_column=-1, skip_header=0):
+        """ Fit training data read from a file a chunk at a time.
+
+        Runs up to epochs passes over the file with partial_fit, reading
+        chunk_size rows at a time (see iter_chunks), so only one chunk is
+        in memory at once. A .npy file is memory-mapped, other files are
+        read as CSV.
+
+        Parameters
+        __________
+        path : str
+            .npy or CSV file, one sample per row, the target in a column.
+
+        chunk_size : int
+            Number of rows read at a time.
+
+        classes : array-like, shape = [2]
+            Class labels, found in the first chunk when None.
+
+        target_column : int
+            Column holding the target values.
+
+        skip_header : int
+            Number of lines to skip at the top of a CSV file.
+
+        Returns
+        _______
+        self : object
+
+        """
+        self._w = None
+        cost = []
+        for _ in range(self.epochs):
+            errors = 0
+            for X, y in iter_chunks(path, chunk_size, target_column,
+                                    skip_header):
+                self.partial_fit(X, y, classes)
+                errors += self.cost_[-1]
+            cost.append(errors)
+            if not errors:
+                break
+        self.cost_ = cost
+        return self
+
+    def _set_classes(self, y):
         # check if {0, 1} or  {-1, 1} class labels are used
         self.classes_ = np.unique(y)
         if not len(self.classes_) == 2 \
@@ -63,29 +179,97 @@ class Perceptron(object):
                     raise ValueError('Only supports binary class labels \
                             {0, 1} 0r {-1, 1}.')
 
-        # initialize weights
+    def _init_weights(self, n_features, init_weights):
         if not isinstance(init_weights, np.ndarray):
-            self.w_ = np.random.random(1 + X.shape[1])
+            self.w_ = np.random.random(1 + n_features)
         else:
             self.w_ = init_weights
+        self._w = self.w_
+        # averaged weights are w - u / steps, u weighting every update by
+        # the number of steps before it, so averaging never needs a pass
+        # over all the weights per step
+        self._u = np.zeros_like(self.w_, dtype=float)
+        self._steps = 0
 
-        self.cost_ = []
+    def _epoch(self, X, y):
+        """ One pass over X, returns the number of misclassifications """
+        if sp.issparse(X):
+            X = _canonical_csr(X)
+        if self.batch_size is not None:
+            return self._batch_epoch(X, y)
+        if sp.issparse(X):
+            return self._sparse_online_epoch(X, y)
+        return self._online_epoch(X, y)
 
-        # learn weights
-        for _ in range(self.epochs):
-            errors = 0
-            for xi, target in zip(X, y):
-                update = self.eta * (target - self.predict(xi))
-                self.w_[1:] += update * xi
-                self.w_[0] += update
-                errors += int(update != 0.0)
+    def _finish(self):
+        if self.average:
+            self.w_ = self._w - self._u / max(self._steps, 1)
 
-            self.cost_.append(errors)
+    def _online_epoch(self, X, y):
+        """ One pass of the perceptron rule, a sample at a time """
+        w = self._w
+        low, high = self.classes_
+        errors = 0
+        for xi, target in zip(X, y):
+            predicted = high if np.dot(xi, w[1:]) + w[0] >= 0.0 else low
+            update = self.eta * (target - predicted)
+            w[1:] += update * xi
+            w[0] += update
+            errors += int(update != 0.0)
+            if self.average:
+                self._u[1:] += self._steps * update * xi
+                self._u[0] += self._steps * update
+                self._steps += 1
+        return errors
 
-        return self
+    def _sparse_online_epoch(self, X, y):
+        """ One pass of the perceptron rule over the rows of a CSR matrix,
+            touching only the non-zero coordinates of every row """
+        w = self._w
+        low, high = self.classes_
+        indptr, indices, data = X.indptr, X.indices, X.data
+        errors = 0
+        for i, target in enumerate(y):
+            cols = indices[indptr[i]:indptr[i + 1]] + 1
+            vals = data[indptr[i]:indptr[i + 1]]
+            predicted = high if np.dot(vals, w[cols]) + w[0] >= 0.0 else low
+            update = self.eta * (target - predicted)
+            if update != 0.0:
+                w[cols] += update * vals
+                w[0] += update
+                errors += 1
+                if self.average:
+                    self._u[cols] += self._steps * update * vals
+                    self._u[0] += self._steps * update
+            if self.average:
+                self._steps += 1
+        return errors
+
+    def _batch_epoch(self, X, y):
+        """ One pass over blocks of batch_size rows """
+        w = self._w
+        low, high = self.classes_
+        errors = 0
+        for start in range(0, X.shape[0], self.batch_size):
+            Xb = X[start:start + self.batch_size]
+            yb = y[start:start + self.batch_size]
+            predicted = np.where(Xb.dot(w[1:]) + w[0] >= 0.0, high, low)
+            update = self.eta * (yb - predicted)
+            # Xb.T.dot only visits the non-zero entries of a sparse block
+            step = Xb.T.dot(update)
+            w[1:] += step
+            w[0] += update.sum()
+            errors += int(np.count_nonzero(update))
+            if self.average:
+                self._u[1:] += self._steps * step
+                self._u[0] += self._steps * update.sum()
+                self._steps += 1
+        return errors
 
     def net_input(self, X):
         """ Net input function """
+        if sp.issparse(X):
+            return X.dot(self.w_[1:]) + self.w_[0]
         return np.dot(X, self.w_[1:]) + self.w_[0]
 
     def predict(self, X):
@@ -105,3 +289,202 @@ class Perceptron(object):
         """
         return np.where(
             self.net_input(X) >= 0.0, self.classes_[1], self.classes_[0])
+
+
+class OneVsRestPerceptron(object):
+    """ Multiclass perceptron, one binary Perceptron per class
+
+    Perceptron k learns class k against all the others, labels 1 and -1,
+    and a sample goes to the class whose perceptron gives the largest net
+    input. The binary perceptrons are independent, so they are trained in
+    a pool of processes. The training matrix is copied once into shared
+    memory which every worker maps read-only, instead of being pickled to
+    every task.
+
+    Parameters
+    ___________
+    eta, epochs, random_state, batch_size, average :
+        Passed to every binary Perceptron, see Perceptron.
+
+    processes : int or None
+        Number of worker processes, None for one per CPU. With 1 the
+        perceptrons are trained one after the other in this process.
+
+    Attributes
+    __________
+    classes_ : 1d-array
+        Class labels, in the order of the rows of W_.
+
+    W_ : 2d-array, shape = [n_classes, n_features + 1]
+        Weights of the binary perceptrons, stacked. Column 0 holds the
+        biases.
+
+    cost_ : list
+        Misclassifications per epoch of every binary perceptron.
+
+    """
+    def __init__(self, eta=0.1, epochs=50, random_state=1, batch_size=None,
+                 average=False, processes=1):
+        self.eta = eta
+        self.epochs = epochs
+        self.random_state = random_state
+        self.batch_size = batch_size
+        self.average = average
+        self.processes = processes
+
+    def fit(self, X, y):
+        """ Fit training data.
+
+        Parameters
+        __________
+        X : {array-like, sparse matrix}, shape = [n_samples, n_features]
+            Training vectors, where n_samples is the number of samples and
+            n_features is the number of features.
+
+        y : array-like, shape = [n_samples]
+            Target values, any number of classes.
+
+        Returns
+        _______
+        self : object
+
+        """
+        if not len(X.shape) == 2:
+            raise ValueError('X must be a 2D array. Try X[:, np.newaxis]')
+        y = np.asarray(y)
+        self.classes_ = np.unique(y)
+        if len(self.classes_) < 2:
+            raise ValueError('Needs at least two classes')
+        params = (self.eta, self.epochs, self.random_state, self.batch_size,
+                  self.average)
+        if sp.issparse(X):
+            X = _canonical_csr(X)
+            arrays = [X.data, X.indices, X.indptr]
+        else:
+            X = np.ascontiguousarray(X, dtype=float)
+            arrays = [X]
+        shape = X.shape
+        tasks = range(len(self.classes_))
+
+        if self.processes == 1:
+            results = [_train_one_vs_rest(X, y, self.classes_, params, k)
+                       for k in tasks]
+        else:
+            with SharedArrays(arrays) as shared:
+                pool = multiprocessing.Pool(
+                    self.processes, _init_one_vs_rest,
+                    (shared.handles, shape, y, self.classes_, params))
+                try:
+                    results = pool.map(_one_vs_rest_task, tasks)
+                finally:
+                    pool.terminate()
+                    pool.join()
+
+        self.W_ = np.array([w for w, _ in results])
+        self.cost_ = [cost for _, cost in results]
+        return self
+
+    def net_input(self, X):
+        """ Net inputs of every binary perceptron, shape [n_samples,
+            n_classes] """
+        if sp.issparse(X):
+            return X.dot(self.W_[:, 1:].T) + self.W_[:, 0]
+        return np.dot(X, self.W_[:, 1:].T) + self.W_[:, 0]
+
+    def predict(self, X):
+        """ Predict class labels for X.
+
+        Parameters
+        __________
+        X : {array-like, sparse matrix}, shape = [n_samples, n_features]
+            Samples to classify.
+
+        Returns
+        _______
+        class : 1d-array
+            Predicted class labels.
+
+        """
+        return self.classes_[np.argmax(self.net_input(X), axis=1)]
+
+
+_ONE_VS_REST = None
+
+
+def _init_one_vs_rest(handles, shape, y, classes, params):
+    """ pool initializer of OneVsRestPerceptron.fit: maps the shared memory
+        copy of the dense matrix or of the CSR data, indices and indptr """
+    global _ONE_VS_REST
+    arrays, blocks = attach(handles)
+    if len(arrays) == 3:
+        X = sp.csr_matrix(tuple(arrays), shape=shape, copy=False)
+    else:
+        X = arrays[0]
+    # blocks are kept so that the mappings outlive the initializer
+    _ONE_VS_REST = X, y, classes, params, blocks
+
+
+def _one_vs_rest_task(k):
+    X, y, classes, params, _ = _ONE_VS_REST
+    return _train_one_vs_rest(X, y, classes, params, k)
+
+
+def _train_one_vs_rest(X, y, classes, params, k):
+    """ weights and cost of the perceptron of class k against the rest """
+    eta, epochs, random_state, batch_size, average = params
+    ppn = Perceptron(eta=eta, epochs=epochs, random_state=random_state,
+                     batch_size=batch_size, average=average)
+    ppn.fit(X, np.where(y == classes[k], 1, -1))
+    return ppn.w_, ppn.cost_
+
+
+def _canonical_csr(X):
+    """ X as CSR without duplicate entries """
+    X = X.tocsr()
+    if not X.has_canonical_format:
+        X = X.copy()
+        X.sum_duplicates()
+    return X
+
+
+def iter_chunks(path, chunk_size=10000, target_column=-1, skip_header=0):
+    """ Stream (X, y) chunks of chunk_size rows from a .npy or CSV file.
+
+    A .npy file is memory-mapped and sliced, so every pass reads it from
+    disk again instead of loading it. Other files are parsed as numeric
+    CSV, chunk_size lines at a time.
+
+    Parameters
+    __________
+    path : str
+        .npy or CSV file, one sample per row.
+
+    chunk_size : int
+        Number of rows per chunk.
+
+    target_column : int
+        Column holding the target values, the others are the features.
+
+    skip_header : int
+        Number of lines to skip at the top of a CSV file.
+
+    """
+    def split(block):
+        y = block[:, target_column]
+        X = np.delete(block, target_column % block.shape[1], axis=1)
+        return X, y
+
+    if path.endswith('.npy'):
+        data = np.load(path, mmap_mode='r')
+        for start in range(0, len(data), chunk_size):
+            yield split(np.asarray(data[start:start + chunk_size], dtype=float))
+        return
+
+    with open(path) as f:
+        for _ in range(skip_header):
+            next(f, None)
+        while True:
+            lines = list(itertools.islice(f, chunk_size))
+            if not lines:
+                break
+            yield split(np.loadtxt(lines, delimiter=',', ndmin=2))
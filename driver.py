@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
-from perceptron import Perceptron
+from classification.adaline import Adaline
+from classification.logistic_regression import LogisticRegression
+from classification.perceptron import OneVsRestPerceptron
 
 
 def perceptron_model():
@@ -9,15 +11,47 @@ def perceptron_model():
 
     df = pd.read_csv('https://archive.ics.uci.edu/ml/machine-learning-databases/iris/iris.data', header=None)
 
-    # setosa and versicolor
-    y = df.iloc[0:100, 4].values
-    y = np.where(y == 'Iris-setosa', -1, 1)
+    # all three species, one perceptron per species against the others
+    y = df.iloc[:, 4].values
 
     # sepal length and petal length
-    X = df.iloc[0:100, [0, 2]].values
-    ppn = Perceptron(epochs=10, eta=0.1)
+    X = df.iloc[:, [0, 2]].values
+    ppn = OneVsRestPerceptron(epochs=10, eta=0.1)
     ppn.fit(X, y)
-    print('Weights: %s' % ppn.w_)
+    print('Classes: %s' % ppn.classes_)
+    print('Weights: %s' % ppn.W_)
+    print('Accuracy: %.2f' % np.mean(ppn.predict(X) == y))
+
+
+def _iris_two_classes():
+    """ setosa and versicolor, sepal length and petal length standardized
+    """
+    df = pd.read_csv('https://archive.ics.uci.edu/ml/machine-learning-databases/iris/iris.data', header=None)
+    y = df.iloc[0:100, 4].values
+    y = np.where(y == 'Iris-setosa', -1, 1)
+    X = df.iloc[0:100, [0, 2]].values
+    X = (X - X.mean(axis=0)) / X.std(axis=0)
+    return X, y
+
+
+def adaline_model():
+    """ Adaline classifier on Iris flower dataset
+    """
+    X, y = _iris_two_classes()
+    ada = Adaline(epochs=15, eta=0.1)
+    ada.fit(X, y)
+    print('Weights: %s' % ada.w_)
+    print('Accuracy: %.2f' % np.mean(ada.predict(X) == y))
+
+
+def logistic_model():
+    """ Logistic regression classifier on Iris flower dataset
+    """
+    X, y = _iris_two_classes()
+    lr = LogisticRegression(epochs=100, eta=0.5)
+    lr.fit(X, y)
+    print('Weights: %s' % lr.w_)
+    print('Accuracy: %.2f' % np.mean(lr.predict(X) == y))
 
 
 def main():
@@ -31,10 +65,14 @@ def main():
     parser = argparse.ArgumentParser(
         description="Classify the data set",
         formatter_class=argparse.RawDescriptionHelpFormatter,)
-    parser.add_argument('--model', help="Choose model", choices=['perceptron'])
+    parser.add_argument('--model', help="Choose model", choices=['perceptron', 'adaline', 'logistic'])
     args = parser.parse_args()
     if args.model == "perceptron":
         perceptron_model()
+    elif args.model == "adaline":
+        adaline_model()
+    elif args.model == "logistic":
+        logistic_model()
 
 
 if __name__ == '__main__':
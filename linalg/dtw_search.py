@@ -0,0 +1,195 @@
+from numpy import asarray, concatenate, cumsum, full, inf, maximum, minimum, sqrt, where, \
+    argsort, arange, zeros
+from numpy.lib.stride_tricks import as_strided
+
+def znorm(x):
+    """
+    Z-normalizes a sequence: zero mean and unit standard deviation. A constant sequence becomes
+    all zeros.
+    """
+    x = asarray(x, dtype=float)
+    std = x.std()
+    return (x - x.mean()) / (std if std > 1e-8 else 1.)
+
+def envelope(x, r):
+    """
+    Keogh's envelope of a sequence: the running maximum and minimum over the 2r+1 points centred
+    on every point. Computed in O(n log r) by doubling the window.
+    :param array x: sequence of length N
+    :param int r: half width of the window
+    Returns the upper and lower envelopes, two arrays of length N.
+    """
+    x = asarray(x, dtype=float)
+    return (_running(maximum, concatenate((full(r, -inf), x, full(r, -inf))), 2 * r + 1),
+            _running(minimum, concatenate((full(r, inf), x, full(r, inf))), 2 * r + 1))
+
+def _running(op, x, w):
+    """ op (maximum or minimum) of every w consecutive points of x """
+    out, span = x, 1
+    while span < w:
+        step = min(span, w - span)
+        out = op(out[:-step], out[step:])
+        span += step
+    return out[:len(x) - w + 1]
+
+def _windows(x, m):
+    """ read-only view of the len(x) - m + 1 windows of m points of x, one per row """
+    x = asarray(x)
+    return as_strided(x, shape=(len(x) - m + 1, m), strides=(x.strides[0], x.strides[0]),
+                      writeable=False)
+
+def subsequence_search(stream, query, k=1, window=None, exclusion=None, block=1 << 16,
+                       batch=64, cells=1 << 20):
+    """
+    Finds the k subsequences of a long sequence closest to a query under DTW, both z-normalized,
+    in the manner of the UCR suite (Rakthanmanon et al., 2012).
+    The stream is read in blocks. In every block the mean and standard deviation of all windows
+    come from running sums, and the windows are discarded by a cascade of lower bounds that get
+    tighter and more expensive: LB_Kim on the first and last points, then LB_Keogh of the window
+    against the envelope of the query, and of the query against the envelope of the data. The
+    windows that are left are aligned in batches, in order of their lower bound, by a banded DTW
+    which drops a window as soon as its partial cost plus the LB_Keogh bound of the rows left
+    exceeds the k-th best distance so far. The LB_Keogh bounds and the alignments work on groups
+    of about cells / M windows of a block, so memory does not grow with the query length.
+    The cost of a DTW cell is the squared difference and the distance is the square root of the
+    total, as in the UCR suite.
+    :param array or iterator stream: the sequence to search, as one array (a memmap works) or an
+    iterator of arrays read one after the other
+    :param array query: the sequence to look for, of length M
+    :param int window: Sakoe-Chiba half width, in points, 5% of M when None
+    :param int exclusion: matches starting less than exclusion points apart overlap and only the
+    better one is kept, M // 2 when None
+    :param int block: number of points handled at once
+    :param int batch: number of windows aligned at once
+    :param int cells: number of window points held at once by the LB_Keogh bounds
+    Returns a list of up to k (distance, position) pairs, best first.
+    """
+    q = znorm(query)
+    m = len(q)
+    r = max(m // 20, 1) if window is None else min(int(window), m - 1)
+    exclusion = m // 2 if exclusion is None else exclusion
+    upper, lower = envelope(q, r)
+    best = []  # (squared distance, position), best first
+
+    if hasattr(stream, '__len__'):
+        parts = (stream[s:s + block] for s in range(0, len(stream), block))
+    else:
+        parts = iter(stream)
+    buf, offset = zeros(0), 0
+    while True:
+        part = next(parts, None)
+        if part is not None:
+            buf = concatenate((buf, asarray(part, dtype=float).reshape(-1)))
+            if len(buf) < block + m - 1:
+                continue
+        if len(buf) >= m:
+            _search_block(buf, offset, q, upper, lower, r, k, exclusion, batch, cells, best)
+            offset += len(buf) - m + 1
+            buf = buf[len(buf) - m + 1:]
+        if part is None:
+            break
+    return [(float(sqrt(d2)), pos) for d2, pos in best]
+
+def _search_block(buf, offset, q, upper, lower, r, k, exclusion, batch, cells, best):
+    """ Searches the windows of buf, the first starting at offset, and updates best """
+    m = len(q)
+    bsf = best[-1][0] if len(best) == k else inf
+    # window statistics from running sums, restarted every block so they do not drift
+    s1 = concatenate(([0.], cumsum(buf)))
+    s2 = concatenate(([0.], cumsum(buf * buf)))
+    mean = (s1[m:] - s1[:-m]) / m
+    std = sqrt(maximum((s2[m:] - s2[:-m]) / m - mean * mean, 0.))
+    std[std < 1e-8] = 1.
+
+    # LB_Kim: the path always matches the first and the last points
+    lb = ((buf[:len(mean)] - mean) / std - q[0]) ** 2 \
+        + ((buf[m - 1:] - mean) / std - q[-1]) ** 2
+    cand = (lb < bsf).nonzero()[0]
+
+    data_upper, data_lower = envelope(buf, r)
+    windows = (_windows(buf, m), _windows(data_upper, m), _windows(data_lower, m))
+    group = max(1, cells // m)
+    for g in range(0, len(cand), group):
+        _search_group(cand[g:g + group], windows, mean, std, offset, q, upper, lower, r, k,
+                      exclusion, batch, best)
+
+def _search_group(cand, windows, mean, std, offset, q, upper, lower, r, k, exclusion, batch,
+                  best):
+    """ Bounds and aligns the windows cand of a block, and updates best """
+    bsf = best[-1][0] if len(best) == k else inf
+    windows, data_upper, data_lower = windows
+
+    # LB_Keogh of the windows against the envelope of the query
+    Z = (windows[cand] - mean[cand, None]) / std[cand, None]
+    below = where(Z > upper, Z - upper, where(Z < lower, lower - Z, 0.)) ** 2
+    lb = below.sum(axis=1)
+    keep = lb < bsf
+    cand, Z, below, lb = cand[keep], Z[keep], below[keep], lb[keep]
+
+    # LB_Keogh of the query against the envelope of the data
+    U = (data_upper[cand] - mean[cand, None]) / std[cand, None]
+    L = (data_lower[cand] - mean[cand, None]) / std[cand, None]
+    above = where(q > U, q - U, where(q < L, L - q, 0.)) ** 2
+    lb2 = above.sum(axis=1)
+    tighter = lb2 > lb
+    below[tighter] = above[tighter]
+    lb = maximum(lb, lb2)
+
+    order = argsort(lb)
+    cand, Z, lb = cand[order], Z[order], lb[order]
+    # tail[:, i] bounds the cost of the rows from i on
+    tail = concatenate((cumsum(below[order][:, ::-1], axis=1)[:, ::-1], zeros((len(cand), 1))),
+                       axis=1)
+    for s in range(0, len(cand), batch):
+        if lb[s] >= bsf:
+            break
+        d2 = _dtw_abandon(q, Z[s:s + batch], tail[s:s + batch], r, bsf)
+        for dist, pos in zip(d2, cand[s:s + batch]):
+            if dist < bsf:
+                _insert(best, dist, offset + int(pos), k, exclusion)
+                bsf = best[-1][0] if len(best) == k else inf
+
+def _dtw_abandon(q, Z, tail, r, bsf):
+    """
+    Banded DTW of q against every row of Z, a row of the band at a time for all of them.
+    The band of row i holds columns i - r to i + r; moves from above and from the diagonal are
+    taken at once, and moves from the left as a prefix minimum over the running sum of the row.
+    Windows whose cheapest cell plus tail[:, i + r + 1] reaches bsf are dropped, and come out
+    as inf.
+    """
+    m, n = len(q), len(Z)
+    W = 2 * r + 1
+    out = full(n, inf)
+    alive = arange(n)
+    offsets = arange(W) - r
+    # columns padded with r points on each side
+    Zp = concatenate((zeros((n, r)), Z, zeros((n, r))), axis=1)
+    for i in range(m):
+        j = i + offsets
+        valid = (j >= 0) & (j < m)
+        cost = where(valid, (Zp[:, i:i + W] - q[i]) ** 2, 0.)
+        if i == 0:
+            t = where(offsets == 0, cost, inf)
+        else:
+            # (i-1, j) is at index t + 1 of the previous row, (i-1, j-1) at index t
+            t = cost + minimum(prev[:, :W], prev[:, 1:])
+        t[:, ~valid] = inf
+        S = cumsum(cost, axis=1)
+        row = S + minimum.accumulate(t - S, axis=1)
+        row[:, ~valid] = inf
+        if i + r + 1 < m:
+            ok = row.min(axis=1) + tail[:, i + r + 1] < bsf
+            if not ok.all():
+                row, alive, Zp, tail = row[ok], alive[ok], Zp[ok], tail[ok]
+                if not len(alive):
+                    return out
+        prev = concatenate((row, full((len(row), 1), inf)), axis=1)
+    out[alive] = prev[:, r]
+    return out
+
+def _insert(best, dist, pos, k, exclusion):
+    """ Adds a match to the sorted list best, unless a better one overlaps it """
+    overlap = [b for b in best if abs(b[1] - pos) < exclusion]
+    if any(d <= dist for d, _ in overlap):
+        return
+    best[:] = sorted([b for b in best if b not in overlap] + [(dist, pos)])[:k]
@@ -1,6 +1,10 @@
-from numpy import array, zeros, argmin, inf, equal, ndim
+import multiprocessing
+from numpy import array, zeros, argmin, inf, equal, ndim, minimum, maximum, arange, full, \
+    ceil, floor, clip, searchsorted, where, concatenate, argsort
 from scipy.spatial.distance import cdist
 
+from utils.shared import SharedArrays, attach
+
 def dtw(x, y, dist):
     """
     Computes Dynamic Time Warping (DTW) of two sequences.
@@ -20,9 +24,7 @@ def dtw(x, y, dist):
         for j in range(c):
             D1[i, j] = dist(x[i], y[j])
     C = D1.copy()
-    for i in range(r):
-        for j in range(c):
-            D1[i, j] += min(D0[i, j], D0[i, j+1], D0[i+1, j])
+    _accumulate(D0)
     if len(x)==1:
         path = zeros(len(y)), range(len(y))
     elif len(y) == 1:
@@ -55,9 +57,7 @@ def fastdtw(x, y, dist):
     D1 = D0[1:, 1:]
     D0[1:,1:] = cdist(x,y,dist)
     C = D1.copy()
-    for i in range(r):
-        for j in range(c):
-            D1[i, j] += min(D0[i, j], D0[i, j+1], D0[i+1, j])
+    _accumulate(D0)
     if len(x)==1:
         path = zeros(len(y)), range(len(y))
     elif len(y) == 1:
@@ -66,6 +66,29 @@ def fastdtw(x, y, dist):
         path = _traceback(D0)
     return D1[-1, -1] / sum(D1.shape), C, D1, path
 
+def _accumulate(D0):
+    """
+    Turns the cost matrix D0[1:, 1:] into the accumulated cost matrix, in place.
+    A cell only depends on the two anti-diagonals before its own, so the matrix is swept one
+    anti-diagonal at a time with whole-array operations on strided views of the flattened
+    matrix. Every cell still gets the same min and the same addition as a cell by cell loop,
+    so the result is bit-identical to it.
+    :param array D0: (r+1)*(c+1) C-contiguous array, first row and column are the boundary
+    """
+    r, c = D0.shape[0] - 1, D0.shape[1] - 1
+    w = c + 1
+    flat = D0.reshape(-1)
+    for d in range(r + c - 1):
+        # cells (i, d - i) of D1, i.e. (i + 1, d - i + 1) of D0; moving down the
+        # anti-diagonal is a step of w - 1 = c in the flattened matrix
+        i0, i1 = max(0, d - c + 1), min(d, r - 1)
+        start = (i0 + 1) * w + d - i0 + 1
+        stop = start + (i1 - i0) * c + 1
+        cell = flat[start:stop:c]
+        cell += minimum(minimum(flat[start - w - 1:stop - w - 1:c],
+                                flat[start - w:stop - w:c]),
+                        flat[start - 1:stop - 1:c])
+
 def _traceback(D):
     i, j = array(D.shape) - 2
     p, q = [i], [j]
@@ -78,9 +101,515 @@ def _traceback(D):
             i -= 1
         else: # (tb == 2):
             j -= 1
-        p.insert(0, i)
-        q.insert(0, j)
-    return array(p), array(q)
+        p.append(i)
+        q.append(j)
+    return array(p[::-1]), array(q[::-1])
+
+def dtw_distance(x, y, dist, strip=256):
+    """
+    Computes the Dynamic Time Warping (DTW) distance of two sequences only, with no cost
+    matrix, accumulated matrix or path. The accumulated costs are swept one row at a time
+    keeping only the previous row, with the shorter sequence along the row, so memory is
+    O(strip * min(N1, N2)). The distance is the one of fastdtw up to rounding.
+    :param array x: N1*M array
+    :param array y: N2*M array
+    :param string or func dist: distance parameter for cdist, see fastdtw
+    :param int strip: number of rows whose costs are computed with one cdist call
+    Returns the minimum distance.
+    """
+    assert len(x)
+    assert len(y)
+    if ndim(x)==1:
+        x = x.reshape(-1,1)
+    if ndim(y)==1:
+        y = y.reshape(-1,1)
+    if len(y) > len(x):
+        x, y = y, x
+    r, c = len(x), len(y)
+    if r <= strip:
+        # the whole matrix is no larger than a strip, accumulate it at once
+        D0 = zeros((r + 1, c + 1))
+        D0[0, 1:] = inf
+        D0[1:, 0] = inf
+        D0[1:, 1:] = cdist(x, y, dist)
+        _accumulate(D0)
+        return D0[-1, -1] / (r + c)
+    return _last_row(x, y, dist, strip)[-1] / (r + c)
+
+def _last_row(x, y, dist, strip=256):
+    """
+    Last row of the accumulated cost matrix of two 2d sequences, keeping a single row.
+    Moves from above and from the diagonal give t = cost + min(up, diagonal) at once; moves from
+    the left chain costs along the row, which with S the running sum of the row's costs is the
+    prefix minimum row[j] = S[j] + min(t[k] - S[k] for k <= j). The result matches the full
+    accumulation up to rounding.
+    """
+    prev = None
+    for s in range(0, len(x), strip):
+        for cost in cdist(x[s:s + strip], y, dist):
+            if prev is None:
+                prev = cost.cumsum()
+                continue
+            t = cost + minimum(concatenate(([inf], prev[:-1])), prev)
+            S = cost.cumsum()
+            prev = S + minimum.accumulate(t - S)
+    return prev
+
+def dtw_path(x, y, dist, strip=256, min_cells=1 << 16):
+    """
+    Computes the Dynamic Time Warping (DTW) distance and a best wrap path of two sequences in
+    linear memory, by divide and conquer (Hirschberg). The rows are split in two halves; the
+    last accumulated row of the top half and of the reversed bottom half tell where the path
+    crosses between the halves, and each quarter on the path is solved recursively. This
+    computes about twice as many cells as fastdtw but holds O(strip * min(N1, N2) + min_cells)
+    of them at a time.
+    :param array x: N1*M array
+    :param array y: N2*M array
+    :param string or func dist: distance parameter for cdist, see fastdtw
+    :param int strip: number of rows whose costs are computed with one cdist call
+    :param int min_cells: sub-problems of at most this many cells are solved with the full matrix
+    Returns the minimum distance and the wrap path.
+    """
+    assert len(x)
+    assert len(y)
+    if ndim(x)==1:
+        x = x.reshape(-1,1)
+    if ndim(y)==1:
+        y = y.reshape(-1,1)
+    p, q = [], []
+    total = _hirschberg(x, y, dist, 0, 0, p, q, strip, min_cells)
+    return total / (len(x) + len(y)), (array(p), array(q))
+
+def _hirschberg(x, y, dist, i0, j0, p, q, strip, min_cells):
+    """ Appends the best path of x, y shifted by (i0, j0) to p, q and returns its cost """
+    r, c = len(x), len(y)
+    if r * c <= min_cells or r == 1 or c == 1:
+        D0 = zeros((r + 1, c + 1))
+        D0[0, 1:] = inf
+        D0[1:, 0] = inf
+        D0[1:, 1:] = cdist(x, y, dist)
+        _accumulate(D0)
+        if r == 1:
+            path = zeros(c, dtype=int), arange(c)
+        elif c == 1:
+            path = arange(r), zeros(r, dtype=int)
+        else:
+            path = _traceback(D0)
+        p.extend(path[0] + i0)
+        q.extend(path[1] + j0)
+        return D0[-1, -1]
+    if c > r:
+        # split the longer sequence, so the rows are halved and the kept rows are short
+        return _hirschberg(y, x, dist, j0, i0, q, p, strip, min_cells)
+    mid = r // 2
+    top = _last_row(x[:mid], y, dist, strip)
+    bottom = _last_row(x[mid:][::-1], y[::-1], dist, strip)[::-1]
+    # the path leaves row mid - 1 at column j and enters row mid at j (down) or j + 1 (diagonal)
+    down = top + bottom
+    diagonal = top[:-1] + bottom[1:]
+    j, step = int(argmin(down)), 0
+    if diagonal[argmin(diagonal)] < down[j]:
+        j, step = int(argmin(diagonal)), 1
+    _hirschberg(x[:mid], y[:j + 1], dist, i0, j0, p, q, strip, min_cells)
+    _hirschberg(x[mid:], y[j + step:], dist, i0 + mid, j0 + j + step, p, q, strip, min_cells)
+    return top[j] + bottom[j + step]
+
+class BandedMatrix(object):
+    """
+    The cells of an r*c matrix that lie in a band, row i holding columns lo[i] <= j < hi[i].
+    The rows are stored one after the other in a flat array, cell (i, j) at
+    values[offsets[i] + j - lo[i]], so memory is the size of the band instead of O(r * c).
+    Cells outside the band read as inf.
+    """
+    def __init__(self, lo, hi, fill=inf):
+        self.lo, self.hi = lo, hi
+        self.shape = (len(lo), int(hi[-1]))
+        self.offsets = concatenate(([0], (hi - lo).cumsum()))
+        self.values = full(self.offsets[-1], fill)
+
+    def __getitem__(self, ij):
+        i, j = ij
+        if self.lo[i] <= j < self.hi[i]:
+            return self.values[self.offsets[i] + j - self.lo[i]]
+        return inf
+
+    def row(self, i):
+        """ Returns the band of row i, columns lo[i] to hi[i] """
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def to_dense(self):
+        """ Returns the full r*c matrix, inf outside the band """
+        dense = full(self.shape, inf)
+        for i in range(self.shape[0]):
+            dense[i, self.lo[i]:self.hi[i]] = self.row(i)
+        return dense
+
+def window_band(r, c, constraint='sakoe_chiba', window=10, slope=2.):
+    """
+    Columns allowed in every row by a global constraint, as two arrays lo, hi (hi exclusive).
+    :param int r: length of x
+    :param int c: length of y
+    :param string constraint: 'sakoe_chiba' keeps cells within window of the diagonal (scaled
+    to the lengths of x and y); 'itakura' keeps the parallelogram whose sides have slopes slope
+    and 1/slope.
+    The band is widened where needed so that it always holds a warp path from (0, 0) to
+    (r-1, c-1).
+    """
+    i = arange(r, dtype=float)
+    if constraint == 'sakoe_chiba':
+        center = i * (c - 1) / max(r - 1, 1)
+        lo = ceil(center - window)
+        hi = floor(center + window) + 1
+    elif constraint == 'itakura':
+        lo = maximum(ceil(i / slope), c - 1 - floor(slope * (r - 1 - i)))
+        hi = minimum(floor(slope * i), c - 1 - ceil((r - 1 - i) / slope)) + 1
+    else:
+        raise ValueError("constraint must be 'sakoe_chiba' or 'itakura'")
+    return _repair_band(lo, hi, c)
+
+def _repair_band(lo, hi, c):
+    """ Clips a band to c columns and widens it until it holds a warp path """
+    lo = clip(lo, 0, c - 1).astype(int)
+    hi = clip(hi, 1, c).astype(int)
+    lo[0], hi[-1] = 0, c
+    # monotone, non-empty rows, and every row touching the one above
+    hi = maximum.accumulate(hi)
+    lo = minimum.accumulate(lo[::-1])[::-1]
+    hi = maximum(hi, lo + 1)
+    lo[1:] = minimum(lo[1:], hi[:-1])
+    return lo, hi
+
+def windowed_dtw(x, y, dist, constraint='sakoe_chiba', window=10, slope=2.):
+    """
+    Computes Dynamic Time Warping (DTW) of two sequences under a global constraint.
+    Only the cells inside the band (see window_band) are computed and stored, so time and
+    memory are O(n * w) for a band of width w. With a band covering the whole matrix the
+    result is identical to fastdtw.
+    :param array x: N1*M array
+    :param array y: N2*M array
+    :param string or func dist: distance parameter for cdist, see fastdtw
+    :param string constraint: 'sakoe_chiba' or 'itakura'
+    :param int window: Sakoe-Chiba half width, in cells
+    :param float slope: Itakura maximal slope
+    Returns the minimum distance, the cost matrix and the accumulated cost matrix as BandedMatrix,
+    and the wrap path.
+    """
+    assert len(x)
+    assert len(y)
+    if ndim(x)==1:
+        x = x.reshape(-1,1)
+    if ndim(y)==1:
+        y = y.reshape(-1,1)
+    lo, hi = window_band(len(x), len(y), constraint, window, slope)
+    return _banded_dtw(x, y, dist, lo, hi)
+
+def approx_dtw(x, y, dist, radius=1):
+    """
+    Approximates Dynamic Time Warping (DTW) of two sequences with the multiresolution FastDTW
+    algorithm (Salvador & Chan, 2007), in linear time and memory.
+    Both sequences are halved by averaging neighbouring points, the warp path of the halved
+    sequences is found recursively, and projected back to the full resolution, where the path
+    is refined in a window of radius cells around the projection. A larger radius is slower
+    but more often finds the optimal path.
+    :param array x: N1*M array
+    :param array y: N2*M array
+    :param string or func dist: distance parameter for cdist, see fastdtw
+    :param int radius: cells searched on each side of the projected path
+    Returns the minimum distance, the cost matrix and the accumulated cost matrix as BandedMatrix
+    over the searched window, and the wrap path.
+    """
+    assert len(x)
+    assert len(y)
+    if ndim(x)==1:
+        x = x.reshape(-1,1)
+    if ndim(y)==1:
+        y = y.reshape(-1,1)
+    return _approx_dtw(x, y, dist, radius)
+
+def _approx_dtw(x, y, dist, radius):
+    r, c = len(x), len(y)
+    min_size = radius + 2
+    if r <= min_size or c <= min_size:
+        return _banded_dtw(x, y, dist, zeros(r, dtype=int), full(r, c))
+    p, q = _approx_dtw(_coarsen(x), _coarsen(y), dist, radius)[3]
+    lo, hi = _project_path(p, q, r, radius)
+    return _banded_dtw(x, y, dist, lo, hi)
+
+def _coarsen(x):
+    """ Halves a sequence by averaging pairs of points, an odd last point is kept """
+    half = (x[:len(x) - 1:2] + x[1::2]) / 2.
+    if len(x) % 2:
+        half = concatenate((half, x[-1:]))
+    return half
+
+def _project_path(p, q, r, radius):
+    """
+    Band of the full resolution matrix with r rows covering the cells of the path (p, q) of the
+    halved sequences, widened by radius cells in every direction.
+    """
+    rows = minimum(arange(r) // 2, p[-1])
+    lo = 2 * q[searchsorted(p, rows, 'left')]
+    hi = 2 * q[searchsorted(p, rows, 'right') - 1] + 2
+    # lo and hi are monotone, so the widest row within radius rows is found at the ends
+    lo = lo[maximum(arange(r) - radius, 0)] - radius
+    hi = hi[minimum(arange(r) + radius, r - 1)] + radius
+    return lo, hi
+
+def _banded_dtw(x, y, dist, lo, hi):
+    """ DTW of two 2d sequences restricted to the band lo, hi """
+    C, D = _banded_accumulate(x, y, dist, lo, hi)
+    path = _traceback_band(D)
+    return D.values[-1] / sum(D.shape), C, D, path
+
+def _banded_accumulate(x, y, dist, lo, hi):
+    """ Banded cost and accumulated cost matrices of two 2d sequences """
+    lo, hi = _repair_band(lo, hi, len(y))
+    C = BandedMatrix(lo, hi)
+    for i in range(len(x)):
+        C.row(i)[:] = cdist(x[i:i+1], y[lo[i]:hi[i]], dist)[0]
+    D = BandedMatrix(lo, hi)
+    _accumulate_band(C, D)
+    return C, D
+
+def _accumulate_band(C, D):
+    """
+    Accumulates the banded cost matrix C into D one anti-diagonal at a time.
+    The position of every cell and of its three neighbours in the flat band is worked out once
+    for the whole band, ordered by anti-diagonal, so that each step of the sweep is a few
+    gathers over slices. Neighbours outside the band point at a trailing inf.
+    """
+    lo, hi, offsets = C.lo, C.hi, C.offsets
+    r, c = C.shape
+    cost = C.values
+    out = len(cost)
+    i = arange(r).repeat(hi - lo)
+    j = arange(out) - offsets[i] + lo[i]
+    order = argsort(i + j, kind='mergesort')
+    bounds = searchsorted((i + j)[order], arange(r + c))
+    i, j = i[order], j[order]
+    left = where(j - 1 >= lo[i], order - 1, out)
+    up_i = maximum(i - 1, 0)
+    up = where((i >= 1) & (lo[up_i] <= j) & (j < hi[up_i]), offsets[up_i] + j - lo[up_i], out)
+    diag = where((i >= 1) & (lo[up_i] < j) & (j - 1 < hi[up_i]),
+                 offsets[up_i] + j - 1 - lo[up_i], out)
+    acc = full(out + 1, inf)
+    acc[0] = cost[0]
+    for d in range(1, r + c - 1):
+        s, e = bounds[d], bounds[d + 1]
+        cell = order[s:e]
+        acc[cell] = cost[cell] + minimum(minimum(acc[diag[s:e]], acc[up[s:e]]), acc[left[s:e]])
+    D.values = acc[:-1]
+
+def _traceback_band(D):
+    i, j = D.shape[0] - 1, D.shape[1] - 1
+    p, q = [i], [j]
+    while ((i > 0) or (j > 0)):
+        if i == 0:
+            tb = 2
+        elif j == 0:
+            tb = 1
+        else:
+            tb = argmin((D[i-1, j-1], D[i-1, j], D[i, j-1]))
+        if (tb == 0):
+            i -= 1
+            j -= 1
+        elif (tb == 1):
+            i -= 1
+        else: # (tb == 2):
+            j -= 1
+        p.append(i)
+        q.append(j)
+    return array(p[::-1]), array(q[::-1])
+
+def pairwise_dtw(series, dist='euclidean', window=None, processes=1, progress=None,
+                 chunk_size=256):
+    """
+    Computes the DTW distance of every pair of a list of sequences, as a condensed distance
+    matrix: the distance of series i and j (i < j) is at index n*i + j - (i+1)*(i+2)/2, the
+    layout of scipy.spatial.distance.pdist, so the result can be handed to
+    scipy.cluster.hierarchy.linkage or turned square with scipy.spatial.distance.squareform.
+    Pairs are computed with dtw_distance, or under a Sakoe-Chiba band when a window is given.
+    With several processes the series are copied once into shared memory which every worker
+    maps, and pairs are handed out in chunks of chunk_size.
+    :param list series: sequences of any lengths, each of length N or N*M with the same M
+    :param string or func dist: distance parameter for cdist, see fastdtw
+    :param int window: Sakoe-Chiba half width, None for unconstrained DTW
+    :param int processes: number of worker processes, None for one per CPU
+    :param func progress: called as progress(done, total) with the number of pairs computed
+    :param int chunk_size: pairs computed per task
+    Returns the condensed distance matrix, an array of n*(n-1)/2 distances.
+    """
+    series = [array(s, dtype=float) for s in series]
+    series = [s.reshape(-1, 1) if ndim(s) == 1 else s for s in series]
+    n = len(series)
+    total = n * (n - 1) // 2
+    out = zeros(total)
+    starts = range(0, total, chunk_size)
+    if not total:
+        return out
+    flat = concatenate(series)
+    offsets = concatenate(([0], array([len(s) for s in series]).cumsum()))
+    done = 0
+    if processes == 1:
+        results = (_pairwise_chunk(series, dist, window, start, min(start + chunk_size, total), n)
+                   for start in starts)
+        for start, values in results:
+            out[start:start + len(values)] = values
+            done += len(values)
+            if progress is not None:
+                progress(done, total)
+        return out
+    with SharedArrays([flat]) as shared:
+        pool = multiprocessing.Pool(processes, _init_pairwise,
+                                    (shared.handles, offsets, dist, window))
+        try:
+            tasks = [(start, min(start + chunk_size, total), n) for start in starts]
+            for start, values in pool.imap_unordered(_pairwise_task, tasks):
+                out[start:start + len(values)] = values
+                done += len(values)
+                if progress is not None:
+                    progress(done, total)
+        finally:
+            pool.terminate()
+            pool.join()
+    return out
+
+_PAIRWISE = None
+
+def _init_pairwise(handles, offsets, dist, window):
+    """ pool initializer of pairwise_dtw: maps the shared memory copy of the series """
+    global _PAIRWISE
+    (flat,), blocks = attach(handles)
+    series = [flat[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+    # blocks are kept so that the mapping outlives the initializer
+    _PAIRWISE = series, dist, window, blocks
+
+def _pairwise_task(args):
+    series, dist, window, _ = _PAIRWISE
+    return _pairwise_chunk(series, dist, window, *args)
+
+def _pairwise_chunk(series, dist, window, start, stop, n):
+    """ distances at the condensed indices start to stop """
+    k = arange(start, stop)
+    # row i holds the indices from n*i - i*(i+1)/2 on, invert that quadratic
+    i = floor((2 * n - 1 - (((2 * n - 1) ** 2 - 8 * k).clip(0)) ** .5) / 2).astype(int)
+    i -= (n * i - i * (i + 1) // 2) > k
+    i += (n * (i + 1) - (i + 1) * (i + 2) // 2) <= k
+    j = k - n * i + i * (i + 1) // 2 + i + 1
+    values = zeros(len(k))
+    for m, (a, b) in enumerate(zip(i, j)):
+        x, y = series[a], series[b]
+        if window is None:
+            values[m] = dtw_distance(x, y, dist)
+        else:
+            lo, hi = window_band(len(x), len(y), window=window)
+            values[m] = _banded_accumulate(x, y, dist, lo, hi)[1].values[-1] / (len(x) + len(y))
+    return start, values
+
+class OnlineDTW(object):
+    """
+    Dynamic Time Warping (DTW) of two sequences that grow one point at a time, e.g. two streams.
+    Only the last row and the last column of the accumulated cost matrix are kept. Appending a
+    point to x adds a row computed from the last row, appending a point to y adds a column
+    computed from the last column, and the distance is always the one of the sequences so far.
+    With a window, the cells are restricted to |i - j| <= window, so an append costs O(window)
+    and the points and cells that fall behind the band are evicted: memory stays O(window) on
+    unbounded streams as long as neither runs more than window points ahead of the other.
+    Without a window, an append costs O(len) and every point is kept.
+    """
+    def __init__(self, dist='euclidean', window=None):
+        """
+        :param string or func dist: distance parameter for cdist, see fastdtw
+        :param int window: Sakoe-Chiba half width, in points
+        """
+        self.dist = dist
+        self.window = window
+        self.len_x, self.len_y = 0, 0
+        self._x, self._y = _Line(), _Line()         # points kept, by index
+        self._row, self._col = _Line(), _Line()     # last row of D by column, last column by row
+
+    @property
+    def distance(self):
+        """ DTW distance of the sequences so far, normalized like fastdtw; inf outside the band """
+        last = self._row.get(self.len_y - 1) if self.len_x else None
+        if last is None:
+            return inf
+        return last / (self.len_x + self.len_y)
+
+    def append_x(self, point):
+        """ Appends a point to x, adding a row """
+        self._row, self._col = self._append(point, self._x, self._y, self._row, self._col,
+                                            self.len_x, self.len_y)
+        self.len_x += 1
+
+    def append_y(self, point):
+        """ Appends a point to y, adding a column """
+        self._col, self._row = self._append(point, self._y, self._x, self._col, self._row,
+                                            self.len_y, self.len_x)
+        self.len_y += 1
+
+    def _append(self, point, own, other, last, cross, i, m):
+        """
+        Adds line i of the side whose points are own, crossing the m lines of the other side.
+        last is line i - 1, cross is line m - 1 of the other side, which gains a cell.
+        Returns the new line and cross.
+        """
+        w = self.window
+        point = array(point, dtype=float).reshape(1, -1)
+        own.append(i, point[0])
+        lo, hi = (0, m) if w is None else (max(0, i - w), min(m, i + w + 1))
+        if lo < hi:
+            cost = cdist(point, other.values(lo, hi), self.dist)[0]
+            if i == 0:
+                t = full(hi - lo, inf)
+                t[0] = cost[0]
+            else:
+                prev = last.values(lo - 1, hi, inf)
+                t = cost + minimum(prev[:-1], prev[1:])
+            S = cost.cumsum()
+            line = _Line(lo, S + minimum.accumulate(t - S))
+        else:
+            line = _Line(lo)
+        if m and line.get(m - 1) is not None:
+            cross.append(i, line.get(m - 1))
+        if w is not None:
+            # what the next lines of either side can still reach
+            other.evict(i + 1 - w)
+            own.evict(m - w)
+            cross.evict(m - w - 1)
+        return line, cross
+
+class _Line(object):
+    """ Values at consecutive indices from start on, which can be dropped from the front """
+    def __init__(self, start=0, values=None):
+        self.start = start
+        self.items = [] if values is None else list(values)
+
+    def append(self, index, value):
+        if not self.items:
+            self.start = index
+        self.items.append(value)
+
+    def get(self, index):
+        k = index - self.start
+        return self.items[k] if 0 <= k < len(self.items) else None
+
+    def values(self, lo, hi, fill=None):
+        """ values from lo to hi, fill outside the stored ones """
+        if fill is None:
+            return array(self.items[lo - self.start:hi - self.start])
+        out = full(hi - lo, fill)
+        a, b = max(lo, self.start), min(hi, self.start + len(self.items))
+        if a < b:
+            out[a - lo:b - lo] = self.items[a - self.start:b - self.start]
+        return out
+
+    def evict(self, index):
+        """ drops the values before index """
+        k = index - self.start
+        if k > 0:
+            del self.items[:k]
+            self.start += k
 
 if __name__ == '__main__':
     if 0: # 1-D numeric
@@ -1,4 +1,83 @@
+import numpy as np
+
+
 class GaussJordan(object):
+    """ Gauss-Jordan elimination - https://en.wikipedia.org/wiki/Gaussian_elimination
+
+    Solves and inverts a whole stack of matrices of shape (batch, n, n) at
+    once: every elimination step, partial pivoting included, is a handful
+    of array operations over the batch, so thousands of small systems cost
+    n vectorized steps instead of a python loop over the systems.
+
+    A member is flagged in singular when one of its pivots is below tol
+    times its largest entry; its results are NaN and the rest of the batch
+    is unaffected.
+    """
+
+    def __init__(self, A, tol=1e-12):
+        """
+        Args:
+            A: square matrix (n, n) or stack of square matrices (batch, n, n)
+            tol: relative size under which a pivot counts as zero
+        """
+        A = np.asarray(A, dtype=float)
+        self.single = A.ndim == 2
+        self.A = A[None] if self.single else A
+        if self.A.ndim != 3 or self.A.shape[1] != self.A.shape[2]:
+            raise ValueError('Gauss-Jordan needs square matrices')
+        self.tol = tol
+        self.singular = None
+
+    def solve(self, b):
+        """ Solves A x = b for every member of the batch
+
+        Args:
+            b: right-hand sides, (n,) or (n, k) shared by the whole batch,
+                or (batch, n) or (batch, n, k)
+        Returns:
+            x: solutions, shaped like b with the batch dimension
+        """
+        batch, n = self.A.shape[:2]
+        b = np.asarray(b, dtype=float)
+        vector = b.ndim == 1 or (b.ndim == 2 and not self.single and
+                                 b.shape == (batch, n))
+        if vector:
+            b = b[..., None]
+        B = np.broadcast_to(b, (batch, n, b.shape[-1]))
+        x = self._reduce(np.concatenate((self.A, B), axis=2))
+        if vector:
+            x = x[..., 0]
+        return x[0] if self.single else x
+
+    def inverse(self):
+        """ Inverses of every member of the batch """
+        n = self.A.shape[1]
+        x = self._reduce(np.concatenate(
+            (self.A, np.broadcast_to(np.eye(n), self.A.shape)), axis=2))
+        return x[0] if self.single else x
 
-    def __init__(self):
-        pass
+    def _reduce(self, M):
+        """ Reduces the augmented matrices M = [A | B] to [I | A^-1 B] and
+            returns A^-1 B
+        """
+        batch, n = M.shape[:2]
+        items = np.arange(batch)
+        scale = np.abs(self.A).max(axis=(1, 2))
+        singular = np.zeros(batch, dtype=bool)
+        for j in range(n):
+            # partial pivoting: bring the largest entry of column j up
+            p = j + np.argmax(np.abs(M[:, j:, j]), axis=1)
+            row = M[items, j].copy()
+            M[items, j] = M[items, p]
+            M[items, p] = row
+            pivot = M[:, j, j]
+            bad = np.abs(pivot) <= self.tol * scale
+            singular |= bad
+            M[:, j] /= np.where(bad, 1., pivot)[:, None]
+            factors = M[:, :, j].copy()
+            factors[:, j] = 0.
+            M -= factors[:, :, None] * M[:, j, None, :]
+        self.singular = singular[0] if self.single else singular
+        x = M[:, :, n:]
+        x[singular] = np.nan
+        return x
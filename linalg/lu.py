@@ -1,50 +1,156 @@
+import numpy as np
+from scipy.linalg import solve_triangular
+
+
 class LUDecomposition():
     """ LU Decomposition - https://en.wikipedia.org/wiki/LU_decomposition
 
-    Note: Implemented for revising basics, not for operational usage.
-    Please refer to scipy.linalg.lu function for operational use
+    Factorizes PA = LU with partial pivoting, L unit lower triangular and
+    U upper triangular. The row permutation is kept as a vector, perm[i]
+    being the row of A that ends up in row i. Once decomposed, the
+    factorization is reused by solve, det and inverse, so any number of
+    right-hand sides costs O(n^2) each instead of a new O(n^3) elimination.
+
+    Small matrices are decomposed by the textbook Doolittle recurrences in
+    plain python. Larger ones go through a blocked right-looking algorithm
+    on a NumPy array: a panel of block_size columns is eliminated with
+    pivoting, then the rest of the matrix is updated with one triangular
+    solve and one matrix product, which run in cache-friendly BLAS calls.
     """
 
-    def __init__(self, A):
-        """ Calculates LU Decomposition
+    def __init__(self, A, block_size=64):
+        """ Prepares the LU Decomposition of A
 
         Args:
-            A: input matrix for LU calculation. Input matrix must be square
-        Returns:
-            L: Lower triangular matrix
-            U: Upper triangular matrix
+            A: input matrix for LU calculation, a list of lists or an array.
+                Input matrix must be square
+            block_size: matrices up to this size use the python path, larger
+                ones are eliminated block_size columns at a time
         """
         self.A = A
         self.n = len(A)
+        self.block_size = block_size
+        self.lu = None
+        self.perm = None
+        self.swaps = 0
 
     def decompose(self):
-        self.L = [[0.0] * self.n for i in range(self.n)]
-        self.U = [[0.0] * self.n for i in range(self.n)]
+        """ Calculates the LU Decomposition
 
-        P = self._set_pivot_matrix()
-        PA = self._multiply_matrices(P)
+        Returns:
+            self, with L (lower triangular matrix) and U (upper triangular
+            matrix) as lists of lists, and perm the row permutation
+        """
+        if not self._is_square():
+            raise ValueError('LU decomposition needs a square matrix')
+        self.swaps = 0
+        if self.n <= self.block_size:
+            self._decompose_small()
+        else:
+            self._decompose_blocked()
+        return self
+
+    @property
+    def L(self):
+        return (np.tril(self.lu, -1) + np.eye(self.n)).tolist()
 
-        for j in range(len(self.A)):
-            pass
+    @property
+    def U(self):
+        return np.triu(self.lu).tolist()
 
-    def _set_pivot_matrix(self):
-        """ Returns pivot matrix for A
+    @property
+    def P(self):
+        """ permutation matrix, PA = LU """
+        return np.eye(self.n)[self.perm].tolist()
+
+    def _decompose_small(self):
+        """ Doolittle's algorithm with partial pivoting, a column at a time
         """
-        i_mat = [[float(i == j) for i in range(self.n)] for j in range(self.n)]
-        print(i_mat)
-        for j in range(self.n):
-            row = max(range(j, self.n), key=lambda i: abs(self.A[i][j]))
-            if j != row:
-                i_mat[j], i_mat[row] = i_mat[row], i_mat[j]
-        return i_mat
-
-    def _multiply_matrices(self, P):
-        """ Multiply matrices and return the result
+        n = self.n
+        A = [[float(x) for x in row] for row in self.A]
+        perm = list(range(n))
+        L = [[0.0] * n for i in range(n)]
+        U = [[0.0] * n for i in range(n)]
+        for j in range(n):
+            for i in range(j):
+                s1 = sum(U[k][j] * L[i][k] for k in range(i))
+                U[i][j] = A[i][j] - s1
+            # the candidates for U[j][j], pick the largest as pivot
+            v = [A[i][j] - sum(U[k][j] * L[i][k] for k in range(j))
+                 for i in range(j, n)]
+            p = max(range(j, n), key=lambda i: abs(v[i - j]))
+            if p != j:
+                A[j], A[p] = A[p], A[j]
+                L[j], L[p] = L[p], L[j]
+                perm[j], perm[p] = perm[p], perm[j]
+                v[0], v[p - j] = v[p - j], v[0]
+                self.swaps += 1
+            U[j][j] = v[0]
+            L[j][j] = 1.0
+            for i in range(j + 1, n):
+                L[i][j] = v[i - j] / U[j][j] if U[j][j] else 0.0
+        lu = np.array(U)
+        lu[np.tril_indices(n, -1)] = np.array(L)[np.tril_indices(n, -1)]
+        self.lu = lu
+        self.perm = np.array(perm)
+
+    def _decompose_blocked(self):
+        """ Blocked right-looking elimination with partial pivoting, in place
+            on a copy of A
         """
-        tuple_N = zip(*self.A)
-        return [
-            [sum(el_m * el_n for el_m, el_n in zip(
-                row_m, col_n)) for col_n in tuple_N] for row_m in P]
+        n, nb = self.n, self.block_size
+        a = np.array(self.A, dtype=float)
+        perm = np.arange(n)
+        for k0 in range(0, n, nb):
+            k1 = min(k0 + nb, n)
+            # eliminate the panel a[k0:, k0:k1], swapping whole rows
+            for j in range(k0, k1):
+                p = j + int(np.argmax(np.abs(a[j:, j])))
+                if p != j:
+                    a[[j, p]] = a[[p, j]]
+                    perm[[j, p]] = perm[[p, j]]
+                    self.swaps += 1
+                if a[j, j]:
+                    a[j + 1:, j] /= a[j, j]
+                a[j + 1:, j + 1:k1] -= np.outer(a[j + 1:, j], a[j, j + 1:k1])
+            if k1 < n:
+                a[k0:k1, k1:] = solve_triangular(
+                    a[k0:k1, k0:k1], a[k0:k1, k1:], lower=True,
+                    unit_diagonal=True)
+                a[k1:, k1:] -= a[k1:, k0:k1].dot(a[k0:k1, k1:])
+        self.lu = a
+        self.perm = perm
+
+    def _factors(self):
+        if self.lu is None:
+            self.decompose()
+        if not np.all(np.diag(self.lu)):
+            raise ValueError('Matrix is singular')
+        return self.lu, self.perm
+
+    def solve(self, b):
+        """ Solves Ax = b with the factorization
+
+        Args:
+            b: right-hand side, a vector of size n or a n*k matrix
+        Returns:
+            x: array of the same shape as b
+        """
+        lu, perm = self._factors()
+        y = solve_triangular(lu, np.asarray(b, dtype=float)[perm],
+                             lower=True, unit_diagonal=True)
+        return solve_triangular(lu, y)
+
+    def det(self):
+        """ Determinant of A, the product of the pivots """
+        if self.lu is None:
+            self.decompose()
+        sign = -1.0 if self.swaps % 2 else 1.0
+        return sign * float(np.prod(np.diag(self.lu)))
+
+    def inverse(self):
+        """ Inverse of A """
+        return self.solve(np.eye(self.n))
 
     def _is_square(self):
         """ Checks if input matrix is square, returns true if it is.
@@ -0,0 +1,311 @@
+import numpy as np
+import scipy.sparse as sp
+from numpy.lib.stride_tricks import as_strided
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+from scipy.sparse.linalg import splu
+
+from linalg.lu import LUDecomposition
+
+
+def bandwidth(A):
+    """ Lower and upper bandwidths (kl, ku) of a dense or scipy.sparse matrix
+    """
+    rows, cols, _ = _entries(A)
+    if not len(rows):
+        return 0, 0
+    offsets = cols - rows
+    return max(0, -int(offsets.min())), max(0, int(offsets.max()))
+
+
+def _entries(A):
+    """ rows, columns and values of the nonzero entries of A """
+    if sp.issparse(A):
+        A = A.tocoo()
+        keep = A.data != 0
+        return A.row[keep], A.col[keep], A.data[keep]
+    A = np.asarray(A, dtype=float)
+    rows, cols = np.nonzero(A)
+    return rows, cols, A[rows, cols]
+
+
+def _narrow(kl, ku, n):
+    """ whether the band storage of BandedLUDecomposition, n rows of
+        2 kl + ku + 1, is small enough to beat a dense factorization """
+    return 4 * (2 * kl + ku + 1) <= n
+
+
+def factorize(A):
+    """ Picks the LU decomposition suited to the structure of A and returns
+        it decomposed: banded when the band is narrow, the sparse one for
+        other scipy.sparse matrices, dense otherwise.
+    """
+    n = A.shape[0] if sp.issparse(A) else len(A)
+    kl, ku = bandwidth(A)
+    if _narrow(kl, ku, n):
+        return BandedLUDecomposition(A, kl, ku).decompose()
+    if sp.issparse(A):
+        return SparseLUDecomposition(A).decompose()
+    return LUDecomposition(A).decompose()
+
+
+class BandedLUDecomposition():
+    """ LU Decomposition of a banded matrix
+
+    Only the band is stored, so a matrix with kl sub- and ku
+    super-diagonals takes O(n (kl + ku)) memory and O(n kl (kl + ku)) time
+    instead of O(n^2) and O(n^3).
+
+    Tridiagonal matrices that are diagonally dominant (no pivoting needed)
+    are factorized by the Thomas algorithm in plain python. Any other band
+    is eliminated with partial pivoting as in LAPACK's gbtrf: the pivot of
+    column j is searched among the kl rows below, which lets U grow to
+    kl + ku super-diagonals, and the multipliers of every step are kept
+    with the swap made at that step.
+    """
+
+    def __init__(self, A, kl=None, ku=None, pivoting=None):
+        """ Prepares the LU Decomposition of A
+
+        Args:
+            A: square banded matrix, dense or scipy.sparse
+            kl, ku: lower and upper bandwidths, found from A when None
+            pivoting: whether to pivot; when None only matrices that are not
+                diagonally dominant are pivoted
+        """
+        self.A = A
+        self.n = A.shape[0] if sp.issparse(A) else len(A)
+        if kl is None or ku is None:
+            kl, ku = bandwidth(A)
+        self.kl, self.ku = kl, ku
+        self.pivoting = pivoting
+        self.thomas = False
+
+    def decompose(self):
+        rows, cols, vals = _entries(self.A)
+        if self.pivoting is None:
+            diag = np.zeros(self.n)
+            off = np.zeros(self.n)
+            on = rows == cols
+            np.add.at(diag, rows[on], np.abs(vals[on]))
+            np.add.at(off, rows[~on], np.abs(vals[~on]))
+            self.pivoting = not np.all(diag >= off)
+        if self.kl <= 1 and self.ku <= 1 and not self.pivoting:
+            self._decompose_thomas(rows, cols, vals)
+        else:
+            self._decompose_band(rows, cols, vals)
+        return self
+
+    def _decompose_thomas(self, rows, cols, vals):
+        """ l[i] = a[i] / u[i - 1], u[i] = d[i] - l[i] c[i - 1] """
+        n = self.n
+        bands = np.zeros((3, n))
+        np.add.at(bands, (cols - rows + 1, rows), vals)
+        a, d, c = bands.tolist()
+        l, u = [0.0] * n, [0.0] * n
+        u[0] = d[0]
+        for i in range(1, n):
+            l[i] = a[i] / u[i - 1] if u[i - 1] else 0.0
+            u[i] = d[i] - l[i] * c[i - 1]
+        self.thomas = True
+        self.lower = np.array(l)
+        self.U = np.stack((u, c), axis=1)
+        self.pivots = np.arange(n)
+
+    def _decompose_band(self, rows, cols, vals):
+        """ Banded elimination with partial pivoting, in place on the band
+        """
+        n, kl, ku = self.n, self.kl, self.ku
+        # row i holds the columns i - kl to i + kl + ku, room for the fill
+        w = 2 * kl + ku + 1
+        W = np.zeros((n, w))
+        np.add.at(W, (rows, cols - rows + kl), vals)
+        flat = W.reshape(-1)
+        step = flat.itemsize
+        self.lower = np.zeros((n, kl))
+        self.pivots = np.arange(n)
+        for j in range(n):
+            r, c = min(kl + 1, n - j), min(kl + ku + 1, n - j)
+            # rows j to j + r - 1, columns j to j + c - 1 of the matrix
+            V = as_strided(flat[j * w + kl:], shape=(r, c),
+                           strides=((w - 1) * step, step))
+            if self.pivoting and r > 1:
+                p = int(np.argmax(np.abs(V[:, 0])))
+                if p:
+                    V[[0, p]] = V[[p, 0]]
+                    self.pivots[j] = j + p
+            if V[0, 0] and r > 1:
+                m = V[1:, 0] / V[0, 0]
+                self.lower[j, :r - 1] = m
+                V[1:, 1:] -= np.outer(m, V[0, 1:])
+        self.U = W[:, kl:].copy()
+
+    def _check(self):
+        if not hasattr(self, 'U'):
+            self.decompose()
+        if not np.all(self.U[:, 0]):
+            raise ValueError('Matrix is singular')
+
+    def solve(self, b):
+        """ Solves Ax = b with the factorization
+
+        Args:
+            b: right-hand side, a vector of size n or a n*k matrix
+        Returns:
+            x: array of the same shape as b
+        """
+        self._check()
+        b = np.asarray(b, dtype=float)
+        y = b.reshape(self.n, -1).copy()
+        n, U = self.n, self.U
+        if self.thomas and y.shape[1] == 1:
+            x = self._solve_thomas(y[:, 0].tolist())
+            return np.array(x).reshape(b.shape)
+        kl = 1 if self.thomas else self.kl
+        for j in range(n):
+            p = self.pivots[j]
+            if p != j:
+                y[[j, p]] = y[[p, j]]
+            r = min(kl, n - 1 - j)
+            if self.thomas and r:
+                y[j + 1] -= self.lower[j + 1] * y[j]
+            elif r:
+                y[j + 1:j + 1 + r] -= self.lower[j, :r, None] * y[j]
+        width = U.shape[1]
+        for i in range(n - 1, -1, -1):
+            c = min(width, n - i)
+            y[i] = (y[i] - U[i, 1:c].dot(y[i + 1:i + c])) / U[i, 0]
+        return y.reshape(b.shape)
+
+    def _solve_thomas(self, y):
+        """ forward and back substitution of a single right-hand side """
+        l = self.lower.tolist()
+        u, c = self.U[:, 0].tolist(), self.U[:, 1].tolist()
+        for i in range(1, self.n):
+            y[i] -= l[i] * y[i - 1]
+        y[-1] /= u[-1]
+        for i in range(self.n - 2, -1, -1):
+            y[i] = (y[i] - c[i] * y[i + 1]) / u[i]
+        return y
+
+    def det(self):
+        """ Determinant of A, the product of the pivots """
+        if not hasattr(self, 'U'):
+            self.decompose()
+        swaps = np.count_nonzero(self.pivots != np.arange(self.n))
+        return (-1.0) ** swaps * float(np.prod(self.U[:, 0]))
+
+    def inverse(self):
+        """ Inverse of A (dense) """
+        return self.solve(np.eye(self.n))
+
+
+class SparseLUDecomposition():
+    """ LU Decomposition of a sparse matrix in CSR form
+
+    The rows and columns are first renumbered by the reverse Cuthill-McKee
+    ordering of the symmetrized sparsity pattern, which gathers the entries
+    close to the diagonal. The LU factors of a matrix can only fill in
+    inside its band, so when the reordered band is narrow the matrix is
+    factorized by BandedLUDecomposition, and fill and work stay bounded by
+    the reduced bandwidth instead of n. When the band stays wide, as for
+    matrices without any local structure, the band storage would be as
+    large as a dense matrix, and the matrix is factorized by SuperLU
+    (scipy.sparse.linalg.splu) instead, which keeps L and U sparse.
+    """
+
+    def __init__(self, A, ordering='rcm'):
+        """ Prepares the LU Decomposition of A
+
+        Args:
+            A: square sparse matrix, anything scipy.sparse.csr_matrix takes
+            ordering: 'rcm' for reverse Cuthill-McKee, None to keep the
+                order of A
+        """
+        self.A = sp.csr_matrix(A)
+        self.n = self.A.shape[0]
+        self.ordering = ordering
+        self.perm = None
+        self.band = None
+        self.superlu = None
+        self._bandwidth = None
+
+    def decompose(self):
+        if self.A.shape[0] != self.A.shape[1]:
+            raise ValueError('LU decomposition needs a square matrix')
+        if self.ordering == 'rcm':
+            pattern = abs(self.A) + abs(self.A).T
+            self.perm = reverse_cuthill_mckee(sp.csr_matrix(pattern),
+                                              symmetric_mode=True)
+        else:
+            self.perm = np.arange(self.n)
+        B = self.A[self.perm][:, self.perm]
+        self._bandwidth = bandwidth(B)
+        self.band = self.superlu = None
+        if _narrow(self._bandwidth[0], self._bandwidth[1], self.n):
+            self.band = BandedLUDecomposition(B, *self._bandwidth).decompose()
+            return self
+        try:
+            self.superlu = splu(self.A.tocsc())
+        except RuntimeError:
+            # exactly singular, det is 0 and solve raises
+            self.superlu = False
+        return self
+
+    @property
+    def bandwidth(self):
+        """ lower and upper bandwidths after reordering """
+        return self._bandwidth
+
+    def _check(self):
+        if self.band is None and self.superlu is None:
+            self.decompose()
+        if self.superlu is False:
+            raise ValueError('Matrix is singular')
+
+    def solve(self, b):
+        """ Solves Ax = b with the factorization
+
+        Args:
+            b: right-hand side, a vector of size n or a n*k matrix
+        Returns:
+            x: array of the same shape as b
+        """
+        self._check()
+        b = np.asarray(b, dtype=float)
+        if self.superlu is not None:
+            return self.superlu.solve(np.ascontiguousarray(b))
+        # with B = A[perm][:, perm], A x = b is B x[perm] = b[perm]
+        x = np.empty_like(b)
+        x[self.perm] = self.band.solve(b[self.perm])
+        return x
+
+    def det(self):
+        """ Determinant of A, unchanged by the symmetric reordering """
+        if self.band is None and self.superlu is None:
+            self.decompose()
+        if self.band is not None:
+            return self.band.det()
+        if self.superlu is False:
+            return 0.0
+        # Pr A Pc = L U with L unit lower triangular
+        sign = _parity(self.superlu.perm_r) * _parity(self.superlu.perm_c)
+        return sign * float(np.prod(self.superlu.U.diagonal()))
+
+    def inverse(self):
+        """ Inverse of A (dense) """
+        return self.solve(np.eye(self.n))
+
+
+def _parity(perm):
+    """ sign of a permutation, from the number of its cycles """
+    perm = np.asarray(perm)
+    seen = np.zeros(len(perm), dtype=bool)
+    cycles = 0
+    for i in range(len(perm)):
+        if not seen[i]:
+            cycles += 1
+            j = i
+            while not seen[j]:
+                seen[j] = True
+                j = perm[j]
+    return -1.0 if (len(perm) - cycles) % 2 else 1.0
@@ -0,0 +1,47 @@
+import numpy as np
+
+from linalg.dtw_search import subsequence_search, znorm, envelope
+from linalg.dynamic_time_wrapping import windowed_dtw
+
+
+def test_envelope():
+    x = np.random.RandomState(0).randn(50)
+    upper, lower = envelope(x, 3)
+    for i in range(50):
+        assert upper[i] == x[max(i - 3, 0):i + 4].max()
+        assert lower[i] == x[max(i - 3, 0):i + 4].min()
+
+
+def test_subsequence_search_matches_brute_force():
+    rng = np.random.RandomState(1)
+    x, q = np.cumsum(rng.randn(1500)), np.cumsum(rng.randn(48))
+    window = 3
+    brute = []
+    for s in range(len(x) - len(q) + 1):
+        acc = windowed_dtw(znorm(q), znorm(x[s:s + len(q)]), 'sqeuclidean',
+                           window=window)[2]
+        brute.append(np.sqrt(acc.values[-1]))
+    order = np.argsort(brute)[:4]
+    found = subsequence_search(x, q, k=4, window=window, exclusion=0,
+                               block=400, batch=5)
+    assert [pos for _, pos in found] == list(order)
+    assert np.allclose([d for d, _ in found], np.take(brute, order))
+    chunks = (x[i:i + 111] for i in range(0, len(x), 111))
+    best = subsequence_search(chunks, q, k=1, window=window, block=300)
+    assert best[0][1] == order[0]
+
+
+def test_subsequence_search_long_query_memory():
+    import tracemalloc
+
+    rng = np.random.RandomState(2)
+    x, q = np.cumsum(rng.randn(6000)), np.cumsum(rng.randn(600))
+    x[2345:2945] = 3 * q + 7
+    tracemalloc.start()
+    found = subsequence_search(x, q, cells=1 << 14)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # a (windows, M) matrix of the whole block would take 26 MB
+    assert peak < 5 * 2 ** 20
+    assert found[0][1] == 2345 and found[0][0] < 1e-6
+    assert subsequence_search(x, q, cells=3000) == found
@@ -0,0 +1,135 @@
+import numpy as np
+
+from linalg.dynamic_time_wrapping import (dtw, fastdtw, windowed_dtw, window_band,
+                                          approx_dtw, dtw_distance, dtw_path,
+                                          pairwise_dtw, OnlineDTW)
+
+
+def _loop_accumulate(C):
+    r, c = C.shape
+    D0 = np.zeros((r + 1, c + 1))
+    D0[0, 1:] = np.inf
+    D0[1:, 0] = np.inf
+    D0[1:, 1:] = C
+    for i in range(r):
+        for j in range(c):
+            D0[i + 1, j + 1] += min(D0[i, j], D0[i, j + 1], D0[i + 1, j])
+    return D0[1:, 1:]
+
+
+def test_accumulation_is_bit_identical():
+    rng = np.random.RandomState(0)
+    for r, c in [(1, 1), (1, 6), (6, 1), (2, 2), (9, 4), (40, 57)]:
+        x, y = rng.randn(r), rng.randn(c)
+        dist, cost, acc, path = fastdtw(x, y, 'euclidean')
+        assert np.array_equal(acc, _loop_accumulate(cost))
+        assert dtw(x, y, lambda a, b: abs(a - b))[0] == dist
+
+
+def test_windowed_dtw():
+    rng = np.random.RandomState(1)
+    for r, c in [(1, 5), (7, 3), (30, 30), (50, 61)]:
+        x, y = rng.randn(r), rng.randn(c)
+        dist, cost, acc, path = fastdtw(x, y, 'euclidean')
+        wdist, wcost, wacc, wpath = windowed_dtw(x, y, 'euclidean',
+                                                 window=max(r, c))
+        assert wdist == dist
+        assert np.array_equal(wacc.to_dense(), acc)
+        assert all(np.array_equal(a, b) for a, b in zip(path, wpath))
+        for constraint in ('sakoe_chiba', 'itakura'):
+            wdist, _, wacc, (p, q) = windowed_dtw(x, y, 'euclidean',
+                                                  constraint, window=2)
+            lo, hi = window_band(r, c, constraint, window=2)
+            assert wdist >= dist and np.isfinite(wdist)
+            assert len(wacc.values) < r * c or c <= 5
+            assert np.all((lo[p] <= q) & (q < hi[p]))
+            assert (p[-1], q[-1]) == (r - 1, c - 1)
+
+
+def test_approx_dtw():
+    rng = np.random.RandomState(2)
+    for r, c in [(3, 7), (101, 99), (200, 37)]:
+        x, y = np.cumsum(rng.randn(r)), np.cumsum(rng.randn(c))
+        dist, cost, acc, path = fastdtw(x, y, 'euclidean')
+        exact = approx_dtw(x, y, 'euclidean', radius=max(r, c))
+        assert exact[0] == dist
+        assert np.array_equal(exact[2].to_dense(), acc)
+        for radius in (0, 1, 5):
+            adist, _, aacc, (p, q) = approx_dtw(x, y, 'euclidean', radius)
+            assert adist >= dist
+            assert (p[-1], q[-1]) == (r - 1, c - 1)
+            assert np.all(np.diff(p) >= 0) and np.all(np.diff(q) >= 0)
+
+
+def test_distance_and_linear_memory_path():
+    rng = np.random.RandomState(3)
+    for r, c in [(1, 4), (6, 1), (61, 13), (90, 140)]:
+        x, y = np.cumsum(rng.randn(r)), np.round(np.cumsum(rng.randn(c)))
+        dist, cost, acc, path = fastdtw(x, y, 'euclidean')
+        assert np.isclose(dtw_distance(x, y, 'euclidean', strip=7), dist)
+        for min_cells in (1, 64):
+            pdist, (p, q) = dtw_path(x, y, 'euclidean', strip=5,
+                                     min_cells=min_cells)
+            assert np.isclose(pdist, dist)
+            assert (p[0], q[0], p[-1], q[-1]) == (0, 0, r - 1, c - 1)
+            dp, dq = np.diff(p), np.diff(q)
+            assert np.all((dp >= 0) & (dp <= 1) & (dq >= 0) & (dq <= 1))
+            assert np.all(dp + dq > 0)
+            assert np.isclose(cost[p, q].sum() / (r + c), dist)
+
+
+def test_pairwise_dtw():
+    from scipy.cluster.hierarchy import linkage
+    rng = np.random.RandomState(4)
+    series = [np.cumsum(rng.randn(rng.randint(5, 30))) for _ in range(9)]
+    expected = [fastdtw(series[i], series[j], 'euclidean')[0]
+                for i in range(9) for j in range(i + 1, 9)]
+    seen = []
+    for processes in (1, 2):
+        condensed = pairwise_dtw(series, processes=processes, chunk_size=5,
+                                 progress=lambda done, total: seen.append(done))
+        assert np.allclose(condensed, expected)
+    assert seen[-1] == len(expected)
+    windowed = pairwise_dtw(series, window=2, processes=2)
+    assert np.all(windowed >= condensed - 1e-12)
+    assert linkage(condensed, 'average').shape == (8, 4)
+
+
+def _windowed_reference(x, y, window):
+    """ DTW over the cells |i - j| <= window, normalized like fastdtw """
+    D = np.full((len(x) + 1, len(y) + 1), np.inf)
+    D[0, 0] = 0.
+    for i in range(len(x)):
+        for j in range(len(y)):
+            if abs(i - j) <= window:
+                D[i + 1, j + 1] = abs(x[i] - y[j]) + min(D[i, j], D[i, j + 1], D[i + 1, j])
+    return D[-1, -1] / (len(x) + len(y))
+
+
+def test_online_dtw():
+    rng = np.random.RandomState(5)
+    x, y = rng.randn(40), rng.randn(35)
+    online, banded = OnlineDTW(), OnlineDTW(window=3)
+    xs, ys = [], []
+    for step in range(75):
+        if (rng.rand() < 0.5 or len(ys) == len(y)) and len(xs) < len(x):
+            xs.append(x[len(xs)])
+            online.append_x(xs[-1])
+            banded.append_x(xs[-1])
+        else:
+            ys.append(y[len(ys)])
+            online.append_y(ys[-1])
+            banded.append_y(ys[-1])
+        if xs and ys:
+            assert np.isclose(online.distance,
+                              fastdtw(np.array(xs), np.array(ys), 'euclidean')[0])
+            assert np.isclose(banded.distance, _windowed_reference(xs, ys, 3))
+    stream = OnlineDTW(window=4)
+    xs, ys = np.sin(np.arange(300) / 10.), np.sin(np.arange(300) / 11.)
+    for k in range(300):
+        stream.append_x(xs[k])
+        stream.append_y(ys[k])
+        if k % 50 == 0:
+            assert np.isclose(stream.distance, _windowed_reference(xs[:k + 1], ys[:k + 1], 4))
+    assert np.isclose(stream.distance, _windowed_reference(xs, ys, 4))
+    assert len(stream._x.items) <= 5 and len(stream._row.items) <= 9
@@ -0,0 +1,186 @@
+import random
+
+import numpy as np
+
+from bio_alg.FMIndex import FMIndex, bwt, ibwt
+from bio_alg.occ import BACKENDS
+from bio_alg.rindex import RLFMIndex
+
+
+def _naive_bwt(s):
+    s += "\0"
+    table = sorted(s[i:] + s[:i] for i in range(len(s)))
+    return "".join(row[-1] for row in table)
+
+
+def test_bwt_matches_rotation_sort():
+    rng = random.Random(0)
+    for _ in range(200):
+        alphabet = rng.choice(['A', 'AC', 'ACGT', 'ACGTN', 'banana'])
+        s = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 50)))
+        assert bwt(s) == _naive_bwt(s)
+
+
+def test_search():
+    fm_index = FMIndex('abracadabra')
+    assert fm_index.search('abra') == [0, 7]
+    assert fm_index.count('a') == 5
+    assert fm_index.search('x') == []
+
+
+def test_occ_table_rank():
+    rng = np.random.RandomState(0)
+    codes = rng.randint(0, 6, size=1000)
+    for backend in sorted(BACKENDS):
+        for sample_rate in (1, 7, 64):
+            table = BACKENDS[backend](codes, '\0ACGNT', sample_rate)
+            for i in (0, 1, 63, 64, 65, 500, 1000):
+                for c in range(6):
+                    assert table.rank(c, i) == \
+                        np.count_nonzero(codes[:i] == c)
+            idx = rng.randint(0, 1001, size=50)
+            expected = [np.count_nonzero(codes[:i] == 2) for i in idx]
+            assert table.rank_many(2, idx).tolist() == expected
+            assert table.access_many(np.arange(1000)).tolist() == \
+                codes.tolist()
+
+
+def test_search_with_sampled_suffix_array():
+    rng = random.Random(1)
+    s = ''.join(rng.choice('ACGT') for _ in range(2000))
+    for sa_sample_rate, backend in ((1, 'plain'), (5, 'dna'), (32, 'wavelet')):
+        fm_index = FMIndex(s, occ_sample_rate=16,
+                           sa_sample_rate=sa_sample_rate, backend=backend)
+        for start in (0, 17, 1990):
+            q = s[start:start + 6]
+            expected = [i for i in range(len(s)) if s.startswith(q, i)]
+            assert fm_index.search(q) == expected
+
+
+def test_save_and_load(tmpdir):
+    rng = random.Random(2)
+    s = ''.join(rng.choice('ACGTN') for _ in range(500))
+    for backend in sorted(BACKENDS):
+        fm_index = FMIndex(s, backend=backend)
+        path = str(tmpdir.join(backend + '.fmi'))
+        fm_index.save(path)
+        for mmap in (True, False):
+            loaded = FMIndex.load(path, mmap=mmap)
+            assert loaded.backend == backend
+            assert loaded.data == fm_index.data
+            for q in ('A', 'ACG', s[100:110]):
+                assert loaded.search(q) == fm_index.search(q)
+
+
+def test_search_many():
+    rng = random.Random(3)
+    s = ''.join(rng.choice('ACGT') for _ in range(1000))
+    fm_index = FMIndex(s)
+    queries = [s[i:i + rng.randint(3, 8)] for i in range(0, 1000, 50)]
+    queries += ['ACGX', 'TTTTTTTTTTTT']
+    expected = [fm_index.search(q) for q in queries]
+    assert list(fm_index.search_many(iter(queries), chunk_size=7)) == expected
+    assert list(fm_index.search_many(queries, processes=2, chunk_size=5)) == \
+        expected
+    assert list(fm_index.count_many(queries)) == [len(m) for m in expected]
+
+
+def test_inverse_bwt():
+    rng = random.Random(4)
+    for _ in range(50):
+        s = ''.join(rng.choice('ACGT') for _ in range(rng.randint(1, 200)))
+        assert ibwt(bwt(s)) == s
+        fm_index = FMIndex(s, sa_sample_rate=rng.randint(1, 40))
+        assert fm_index.getOriginal() == s
+        assert ''.join(fm_index.iter_original(chunk_size=16)) == s
+
+
+def test_generalized_index_from_fasta(tmpdir):
+    path = tmpdir.join('reads.fa')
+    path.write('>chr1 first\nACGTAC\nGTAA\n>chr2\nTTACG\n>chr3\nACG\n')
+    fm_index = FMIndex.from_fasta(str(path))
+    assert fm_index.record_ids == ['chr1', 'chr2', 'chr3']
+    expected = [('chr1', 0), ('chr1', 4), ('chr2', 2), ('chr3', 0)]
+    assert fm_index.search('ACG') == expected
+    # no match may span two records
+    assert fm_index.search('AATT') == []
+
+    fm_index.save(str(tmpdir.join('reads.fmi')))
+    loaded = FMIndex.load(str(tmpdir.join('reads.fmi')))
+    assert list(loaded.search_many(['ACG'])) == [expected]
+
+
+def test_search_approx():
+    rng = random.Random(5)
+    s = ''.join(rng.choice('ACGT') for _ in range(2000))
+    fm_index = FMIndex(s)
+    q = list(s[700:715])
+    q[3], q[11] = ('A' if q[3] != 'A' else 'C'), ('G' if q[11] != 'G' else 'T')
+    q = ''.join(q)
+    for k in range(3):
+        expected = []
+        for i in range(len(s) - len(q) + 1):
+            diffs = sum(a != b for a, b in zip(s[i:i + len(q)], q))
+            if diffs <= k:
+                expected.append((i, diffs))
+        assert fm_index.search_approx(q, k) == expected
+    assert (700, 3) in fm_index.search_approx(q[:5] + q[6:], 3, mode='edit')
+    assert len(fm_index.search_approx('ACG', 2, max_hits=10)) == 10
+    assert _located_rows(fm_index, 'ACG', 2, max_hits=10) <= 10
+
+
+def _located_rows(index, q, k, max_hits):
+    """ number of rows search_approx locates """
+    located = []
+    locate_range = index._locate_range
+
+    def counting(*args):
+        offsets = locate_range(*args)
+        located.append(len(offsets))
+        return offsets
+
+    index._locate_range = counting
+    try:
+        index.search_approx(q, k, max_hits=max_hits)
+    finally:
+        del index._locate_range
+    return sum(located)
+
+
+def test_run_length_index():
+    rng = random.Random(6)
+    base = ''.join(rng.choice('ACGT') for _ in range(300))
+    strains = []
+    for k in range(10):
+        s = list(base)
+        s[rng.randrange(len(s))] = rng.choice('ACGT')
+        strains.append(('strain%d' % k, ''.join(s)))
+    r_index = RLFMIndex.from_records(strains)
+    fm_index = FMIndex.from_records(strains)
+    assert r_index.runs() < len(r_index) // 5
+    assert r_index.RLE() == fm_index.RLE()
+    for q in (base[:10], base[150:152], 'ACGTACGTAC', 'T'):
+        assert r_index.count(q) == fm_index.count(q)
+        assert r_index.search(q) == fm_index.search(q)
+    q = base[40:60]
+    for k, mode in ((1, 'mismatch'), (2, 'edit')):
+        assert r_index.search_approx(q, k, mode) == \
+            fm_index.search_approx(q, k, mode)
+    assert len(r_index.search_approx('AC', 1, max_hits=7)) == 7
+    assert _located_rows(r_index, 'AC', 1, max_hits=7) <= 7
+    for chunk_size in (1, 50, 1 << 20):
+        assert ''.join(r_index.iter_original(chunk_size)) == \
+            fm_index.getOriginal()
+
+
+def test_load_run_length_index_in_fresh_process(tmpdir):
+    import subprocess
+    import sys
+
+    path = str(tmpdir.join('strains.fmi'))
+    RLFMIndex('ACGTACGTTACG' * 20).save(path)
+    code = ("from bio_alg.FMIndex import FMIndex; "
+            "index = FMIndex.load({!r}); "
+            "print(type(index).__name__, index.count('TACG'))").format(path)
+    out = subprocess.check_output([sys.executable, '-c', code])
+    assert out.decode().split() == ['RLFMIndex', '40']
@@ -0,0 +1,22 @@
+import numpy as np
+
+from linalg.gauss_jordan import GaussJordan
+
+
+def test_batched_solve_and_inverse():
+    rng = np.random.RandomState(0)
+    A = rng.randn(50, 5, 5)
+    A[3] = 0.
+    A[7, 2] = 2 * A[7, 1]
+    b = rng.randn(50, 5)
+    gj = GaussJordan(A)
+    x = gj.solve(b)
+    assert list(gj.singular.nonzero()[0]) == [3, 7]
+    ok = ~gj.singular
+    assert np.allclose(np.einsum('bij,bj->bi', A[ok], x[ok]), b[ok])
+    assert np.isnan(x[3]).all() and np.isnan(x[7]).all()
+    inv = gj.inverse()
+    assert np.allclose(np.matmul(inv[ok], A[ok]), np.eye(5))
+    single = GaussJordan(A[0])
+    assert np.allclose(A[0].dot(single.solve(b[0])), b[0])
+    assert not single.singular
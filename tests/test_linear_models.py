@@ -0,0 +1,37 @@
+import numpy as np
+import scipy.sparse as sp
+
+from classification.adaline import Adaline
+from classification.logistic_regression import LogisticRegression
+from tests.test_perceptron import _separable
+
+
+def test_full_batch_and_mini_batch_modes():
+    X, y = _separable(np.random.RandomState(0), n=400, labels=(0, 1))
+    for model in (Adaline, LogisticRegression):
+        full = model(eta=0.5, epochs=100).fit(X, y)
+        assert full.cost_[-1] < full.cost_[0]
+        assert np.mean(full.predict(X) == y) > 0.95
+        sgd = model(eta=0.05, epochs=20, batch_size=16).fit(X, y)
+        assert np.mean(sgd.predict(X) == y) > 0.95
+        sparse = model(eta=0.5, epochs=100).fit(sp.csr_matrix(X), y)
+        assert np.allclose(sparse.w_, full.w_)
+
+
+def test_partial_fit_matches_fit():
+    X, y = _separable(np.random.RandomState(1), n=400)
+    for model in (Adaline, LogisticRegression):
+        fitted = model(eta=0.5, epochs=3).fit(X, y)
+        chunked = model(eta=0.5)
+        for _ in range(3):
+            chunked.partial_fit(X, y)
+        assert np.allclose(chunked.w_, fitted.w_)
+        assert chunked.cost_ == fitted.cost_
+
+
+def test_logistic_probabilities():
+    X, y = _separable(np.random.RandomState(2), n=400, labels=(0, 1))
+    lr = LogisticRegression(eta=0.5, epochs=200).fit(X, y)
+    proba = lr.predict_proba(X)
+    assert np.all((proba >= 0) & (proba <= 1))
+    assert np.array_equal(lr.predict(X), np.where(proba >= 0.5, 1, 0))
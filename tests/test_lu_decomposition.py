@@ -21,3 +21,23 @@ def test_lu_decomposition():
         [0.0, 0.0, 3.5531914893617023, 0.31914893617021267],
         [0.0, 0.0, 0.0, 1.88622754491018]
     ]
+
+
+def test_lu_solve_det_inverse():
+    import numpy as np
+
+    rng = np.random.RandomState(0)
+    for n, block_size in [(4, 64), (37, 8), (130, 64)]:
+        A = rng.randn(n, n)
+        lu = LUDecomposition(A, block_size=block_size).decompose()
+        P, L, U = np.array(lu.P), np.array(lu.L), np.array(lu.U)
+        assert np.allclose(P.dot(A), L.dot(U))
+        assert np.allclose(A[lu.perm], L.dot(U))
+        b = rng.randn(n, 3)
+        assert np.allclose(A.dot(lu.solve(b)), b)
+        assert np.isclose(lu.det(), np.linalg.det(A))
+        assert np.allclose(lu.inverse().dot(A), np.eye(n))
+        assert np.isclose(lu.decompose().det(), np.linalg.det(A))
+
+    swap = LUDecomposition([[0, 1], [1, 0]])
+    assert swap.decompose().decompose().det() == -1.0
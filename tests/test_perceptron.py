@@ -0,0 +1,86 @@
+import numpy as np
+
+from classification.perceptron import OneVsRestPerceptron, Perceptron
+
+
+def _separable(rng, n=300, d=5, labels=(-1, 1)):
+    X = rng.randn(n, d)
+    y = np.where(np.dot(X, rng.randn(d)) + 0.3 > 0, labels[1], labels[0])
+    return X, y
+
+
+def test_online_mode_stops_on_zero_error_epoch():
+    X, y = _separable(np.random.RandomState(0))
+    ppn = Perceptron(epochs=100).fit(X, y)
+    assert ppn.cost_[-1] == 0 and len(ppn.cost_) < 100
+    assert np.all(ppn.predict(X) == y)
+
+
+def test_mini_batch_and_averaged_modes():
+    X, y = _separable(np.random.RandomState(1))
+    for batch_size in (1, 32, len(X)):
+        ppn = Perceptron(epochs=200, eta=0.01, batch_size=batch_size).fit(X, y)
+        assert ppn.cost_[-1] == 0
+        assert np.all(ppn.predict(X) == y)
+        avg = Perceptron(epochs=200, eta=0.01, batch_size=batch_size,
+                         average=True).fit(X, y)
+        assert np.mean(avg.predict(X) == y) > 0.95
+
+
+def test_partial_fit_and_streaming(tmpdir):
+    X, y = _separable(np.random.RandomState(2), n=600, d=4, labels=(0, 1))
+    path = str(tmpdir.join('train.npy'))
+    np.save(path, np.column_stack((X, y)))
+    in_memory = Perceptron(epochs=20, batch_size=32).fit(X, y)
+    streamed = Perceptron(epochs=20, batch_size=32).fit_stream(
+        path, chunk_size=96)
+    assert streamed.cost_ == in_memory.cost_
+    assert np.array_equal(streamed.w_, in_memory.w_)
+
+    csv = str(tmpdir.join('train.csv'))
+    np.savetxt(csv, np.column_stack((y, X)), delimiter=',', header='y,a,b,c,d',
+               comments='')
+    from_csv = Perceptron(epochs=50).fit_stream(
+        csv, chunk_size=70, classes=[0, 1], target_column=0, skip_header=1)
+    assert np.mean(from_csv.predict(X) == y) > 0.95
+
+    chunked = Perceptron(epochs=1)
+    for start in range(0, len(X), 100):
+        chunked.partial_fit(X[start:start + 100], y[start:start + 100],
+                            classes=[0, 1])
+    assert len(chunked.cost_) == 6
+    assert np.mean(chunked.predict(X) == y) > 0.9
+
+
+def test_sparse_input_matches_dense():
+    import scipy.sparse as sp
+
+    rng = np.random.RandomState(3)
+    X, y = _separable(rng, d=6)
+    X[np.abs(X) < 0.8] = 0.
+    S = sp.csr_matrix(X)
+    for batch_size in (None, 16):
+        for average in (False, True):
+            dense = Perceptron(epochs=30, batch_size=batch_size,
+                               average=average).fit(X, y)
+            sparse = Perceptron(epochs=30, batch_size=batch_size,
+                                average=average).fit(S.tocoo(), y)
+            assert dense.cost_ == sparse.cost_
+            assert np.allclose(dense.w_, sparse.w_)
+            assert np.array_equal(dense.predict(X), sparse.predict(S))
+
+
+def test_one_vs_rest_in_processes():
+    import scipy.sparse as sp
+
+    rng = np.random.RandomState(4)
+    centers = 6 * np.eye(4)
+    y = rng.randint(4, size=400)
+    X = centers[y] + rng.randn(400, 4)
+    serial = OneVsRestPerceptron(epochs=20, batch_size=32).fit(X, y)
+    pooled = OneVsRestPerceptron(epochs=20, batch_size=32,
+                                 processes=2).fit(sp.csr_matrix(X), y)
+    assert serial.W_.shape == (4, 5)
+    assert np.allclose(serial.W_, pooled.W_)
+    assert np.mean(serial.predict(X) == y) > 0.95
+    assert np.array_equal(serial.predict(X), pooled.predict(X))
@@ -0,0 +1,62 @@
+import numpy as np
+import scipy.sparse as sp
+
+from linalg.lu import LUDecomposition
+from linalg.sparse_lu import (BandedLUDecomposition, SparseLUDecomposition,
+                              bandwidth, factorize)
+
+
+def _banded(rng, n, kl, ku):
+    A = np.zeros((n, n))
+    for k in range(-kl, ku + 1):
+        A += np.diag(rng.randn(n - abs(k)), k)
+    return A + np.diag(1.5 * np.sign(np.diag(A)))
+
+
+def test_banded_lu():
+    rng = np.random.RandomState(0)
+    tridiagonal = sp.diags([rng.rand(19), rng.rand(20) + 3, rng.rand(19)],
+                           [-1, 0, 1])
+    for A in (tridiagonal.toarray(), _banded(rng, 10, 1, 1),
+              _banded(rng, 30, 2, 3), _banded(rng, 30, 3, 0)):
+        for matrix in (A, sp.csr_matrix(A)):
+            lu = BandedLUDecomposition(matrix).decompose()
+            assert lu.thomas == (bandwidth(A) == (1, 1) and not lu.pivoting)
+            b = rng.randn(len(A), 2)
+            assert np.allclose(A.dot(lu.solve(b)), b)
+            assert np.allclose(A.dot(lu.solve(b[:, 0])), b[:, 0])
+            assert np.isclose(lu.det(), np.linalg.det(A), rtol=1e-9, atol=0)
+            assert np.allclose(lu.inverse().dot(A), np.eye(len(A)))
+
+
+def test_sparse_lu_reorders():
+    rng = np.random.RandomState(1)
+    m = 20
+    grid = sp.kron(sp.eye(m), sp.diags([-1., 4., -1.], [-1, 0, 1], (m, m))) \
+        + sp.kron(sp.diags([-1., -1.], [-1, 1], (m, m)), sp.eye(m))
+    perm = rng.permutation(m * m)
+    A = grid.tocsr()[perm][:, perm]
+    lu = SparseLUDecomposition(A).decompose()
+    assert max(lu.bandwidth) <= 2 * m < max(bandwidth(A))
+    assert lu.band is not None
+    b = rng.randn(m * m)
+    assert np.allclose(A.dot(lu.solve(b)), b)
+    assert np.isclose(lu.det(), np.linalg.det(A.toarray()))
+    assert isinstance(factorize(A), SparseLUDecomposition)
+    assert isinstance(factorize(_banded(rng, 40, 2, 2)), BandedLUDecomposition)
+    assert isinstance(factorize(rng.randn(5, 5)), LUDecomposition)
+
+
+def test_sparse_lu_wide_band_uses_superlu():
+    rng = np.random.RandomState(2)
+    n = 400
+    A = sp.random(n, n, density=0.01, random_state=rng, format='csr') \
+        + sp.diags(rng.choice([-2., 2.], n))
+    lu = factorize(A)
+    assert isinstance(lu, SparseLUDecomposition)
+    assert 4 * (2 * lu.bandwidth[0] + lu.bandwidth[1] + 1) > n
+    assert lu.band is None
+    b = rng.randn(n, 2)
+    assert np.allclose(A.dot(lu.solve(b)), b)
+    assert np.allclose(A.dot(lu.solve(b[:, 0])), b[:, 0])
+    assert np.isclose(lu.det(), np.linalg.det(A.toarray()))
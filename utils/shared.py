@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class SharedArrays(object):
+    """ Copies of arrays in shared memory, for the workers of a pool
+
+    Every array is copied once into its own shared memory block. The
+    handles (name, shape and dtype of every block) are small enough to be
+    handed to a pool initializer, where attach maps the blocks instead of
+    unpickling a copy of the arrays in every worker. Used as a context
+    manager, the blocks are freed on exit.
+
+    multiprocessing.shared_memory needs python 3.8; it is only imported
+    once an instance is made, so the modules using this one still import
+    on older versions.
+    """
+
+    def __init__(self, arrays):
+        """
+        Args:
+            arrays: iterable of numpy arrays
+        """
+        from multiprocessing import shared_memory
+        self.blocks = []
+        self.handles = []
+        try:
+            for a in arrays:
+                a = np.ascontiguousarray(a)
+                shm = shared_memory.SharedMemory(create=True,
+                                                 size=max(a.nbytes, 1))
+                self.blocks.append(shm)
+                np.ndarray(a.shape, a.dtype, buffer=shm.buf)[:] = a
+                self.handles.append((shm.name, a.shape, a.dtype.str))
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        """ frees the shared memory blocks """
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach(handles):
+    """ Maps the arrays of SharedArrays.handles in a worker
+
+    Returns:
+        views: read-only arrays backed by the shared memory blocks
+        blocks: the blocks, to be kept as long as the views are in use
+    """
+    from multiprocessing import shared_memory
+    views, blocks = [], []
+    for name, shape, dtype in handles:
+        shm = shared_memory.SharedMemory(name=name)
+        view = np.ndarray(shape, dtype, buffer=shm.buf)
+        view.flags.writeable = False
+        blocks.append(shm)
+        views.append(view)
+    return views, blocks